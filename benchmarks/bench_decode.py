@@ -0,0 +1,43 @@
+"""Micro-benchmark for decoding dealer websocket frames.
+
+Compares the original path (stdlib json.loads on every frame, then
+dropping pongs) with websocket.decode_message. Run from the repository
+root:
+
+    python -m benchmarks.bench_decode
+"""
+
+import json
+import timeit
+
+from custom_components.spotify import websocket
+
+from .payloads import dealer_frames
+
+
+def decode_all_stdlib(frames):
+    for frame in frames:
+        data = json.loads(frame)
+        if data.get("type") == "pong":
+            continue
+
+
+def decode_all(frames):
+    for frame in frames:
+        websocket.decode_message(frame)
+
+
+def main(number=20, repeat=5):
+    frames = dealer_frames()
+    total_bytes = sum(len(frame) for frame in frames)
+    print(f"{len(frames)} frames, {total_bytes / len(frames) / 1024:.1f} KiB average")
+    print(f"decoder: {websocket.json_loads.__module__}")
+
+    for name, func in (("stdlib json.loads", decode_all_stdlib), ("decode_message", decode_all)):
+        best = min(timeit.repeat(lambda: func(frames), number=number, repeat=repeat))
+        per_message = best / (number * len(frames)) * 1e6
+        print(f"{name:>20}: {per_message:8.2f} us/message")
+
+
+if __name__ == "__main__":
+    main()
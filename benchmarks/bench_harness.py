@@ -0,0 +1,143 @@
+"""End-to-end benchmark against a local Spotify stand-in.
+
+Runs playback.Spotify and websocket.SpotifyWebsocket against
+benchmarks.standin, replays dealer frames and sends playback commands,
+then reports:
+
+- messages per second processed and CPU time per message
+- memory allocated while processing, per message
+- entity update notifications per cluster message (an upper bound on state
+  writes; the entity only writes when a visible attribute changed)
+- command round trip and command-to-echo latency
+
+Needs homeassistant and the integration's requirements installed. Run
+from the repository root:
+
+    python -m benchmarks.bench_harness --messages 2000 --rate 0 --commands 50
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+
+from custom_components.spotify import playback, websocket
+from custom_components.spotify.const import UPDATE_MAX_LATENCY
+
+from .payloads import dealer_frames
+from .standin import RedirectingSession, StandIn
+
+
+async def wait_for(predicate, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise TimeoutError("benchmark condition not reached")
+        await asyncio.sleep(0.005)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+async def bench_messages(standin, stats, notifications, count, rate):
+    frames = dealer_frames(count)
+    clusters = sum(1 for frame in frames if '"cluster"' in frame)
+    received = stats.counters["websocket_messages"]
+    notified = len(notifications)
+
+    tracemalloc.start()
+    cpu_start = time.process_time()
+    start = time.monotonic()
+    await standin.replay(frames, rate)
+    await wait_for(lambda: stats.counters["websocket_messages"] >= received + len(frames))
+    elapsed = time.monotonic() - start
+    cpu = time.process_time() - cpu_start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Let the last coalesced update go out before counting notifications
+    await asyncio.sleep(UPDATE_MAX_LATENCY + 0.1)
+    notified = len(notifications) - notified
+
+    print(f"messages:        {len(frames)} ({clusters} cluster updates), rate {rate or 'unthrottled'}/s")
+    print(f"throughput:      {len(frames) / elapsed:,.0f} messages/s")
+    print(f"cpu per message: {cpu / len(frames) * 1e6:,.1f} us (stand-in included)")
+    print(f"peak memory:     {peak / 1024:,.0f} KiB traced, {peak / len(frames):,.0f} B per message")
+    print(f"notifications:   {notified} ({notified / clusters:.2f} per cluster update)")
+
+
+async def bench_commands(spotify, connection, notifications, count):
+    device = connection.state.active_device_id
+    round_trips = []
+    echoes = []
+
+    for i in range(count):
+        seen = len(notifications)
+        connection.expect_command_echo()
+        start = time.monotonic()
+        response = await (spotify.pause(device) if i % 2 == 0 else spotify.resume(device))
+        round_trips.append(time.monotonic() - start)
+        if not response or response["status_code"] != 200:
+            raise RuntimeError(f"command failed: {response}")
+        await wait_for(lambda: any("is_paused" in changed for _, changed in notifications[seen:]))
+        echo_at = next(at for at, changed in notifications[seen:] if "is_paused" in changed)
+        echoes.append(echo_at - start)
+
+    for name, values in (("command round trip", round_trips), ("command to echo", echoes)):
+        print(
+            f"{name + ':':<19}median {statistics.median(values) * 1000:.1f} ms, "
+            f"p95 {percentile(values, 0.95) * 1000:.1f} ms over {len(values)} commands"
+        )
+
+
+async def run(args):
+    standin = StandIn(latency=args.latency / 1000)
+    base_url = await standin.start()
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        session = RedirectingSession(base_url, connector=playback.create_connector())
+        spotify = playback.Spotify("benchmark", session)
+        connection = websocket.SpotifyWebsocket(hass, spotify, session, "benchmark")
+
+        notifications = []
+
+        @callback
+        def record_update(changed):
+            notifications.append((time.monotonic(), changed))
+
+        async_dispatcher_connect(hass, connection.update_signal, record_update)
+
+        try:
+            await connection.start()
+            await asyncio.wait_for(standin.registered.wait(), 30)
+            await wait_for(lambda: connection.state is not None)
+
+            await bench_messages(standin, spotify.stats, notifications, args.messages, args.rate)
+            await bench_commands(spotify, connection, notifications, args.commands)
+            print(f"http requests:   {standin.requests}")
+        finally:
+            await connection.stop()
+            spotify.close()
+            await session.close()
+            await standin.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--messages", type=int, default=2000, help="dealer frames to replay")
+    parser.add_argument("--rate", type=float, default=0, help="frames per second, 0 for unthrottled")
+    parser.add_argument("--commands", type=int, default=50, help="pause/resume commands to send")
+    parser.add_argument("--latency", type=float, default=0, help="added stand-in response latency in ms")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
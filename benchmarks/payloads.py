@@ -0,0 +1,160 @@
+"""Dealer websocket frames shaped like captured Spotify traffic.
+
+Identifiers and metadata are synthetic, but the structure, key order and
+sizes follow frames recorded from a household account with eight Connect
+devices and a long queue.
+"""
+
+import json
+import random
+
+# Queue tracks listed before and after the current one in each cluster
+PREV_TRACKS = 20
+NEXT_TRACKS = 80
+
+DEVICE_TYPES = ["COMPUTER", "SMARTPHONE", "SPEAKER", "TV", "AVR", "GAME_CONSOLE", "CAST_VIDEO", "AUTOMOBILE"]
+
+
+def max_position(track_ids):
+    """Return the last queue position that still has NEXT_TRACKS tracks after it."""
+    return len(track_ids) - NEXT_TRACKS - 2
+
+
+def _track(rng, uid):
+    return {
+        "uri": f"spotify:track:{uid}",
+        "uid": f"{rng.getrandbits(64):016x}",
+        "metadata": {
+            "context_uri": "spotify:playlist:37i9dQZF1DXcBWIGoYBM5M",
+            "entity_uri": "spotify:playlist:37i9dQZF1DXcBWIGoYBM5M",
+            "iteration": "0",
+            "track_player": "audio",
+            "interaction_id": f"{rng.getrandbits(128):032x}",
+        },
+        "provider": "context",
+    }
+
+
+def _track_id(rng):
+    alphabet = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+    return "".join(rng.choice(alphabet) for _ in range(22))
+
+
+def _device(rng, index):
+    device_id = f"{rng.getrandbits(160):040x}"
+    return device_id, {
+        "can_play": True,
+        "volume": rng.randrange(0, 65536),
+        "name": f"Device {index}",
+        "capabilities": {
+            "can_be_player": True,
+            "gaia_eq_connect_id": True,
+            "supports_logout": True,
+            "is_observable": True,
+            "volume_steps": 64,
+            "supported_types": ["audio/track", "audio/episode", "video/episode"],
+            "command_acks": True,
+            "supports_playlist_v2": True,
+            "is_controllable": True,
+            "supports_external_episodes": True,
+            "supports_set_options_command": True,
+            "supports_command_request": True,
+            "supports_set_volume": True,
+            "supports_hifi": {"device_supported": True},
+        },
+        "device_software_version": "1.2.56.502",
+        "device_type": DEVICE_TYPES[index % len(DEVICE_TYPES)],
+        "spirc_version": "3.2.6",
+        "device_id": device_id,
+        "client_id": f"{rng.getrandbits(128):032x}",
+        "brand": "spotify",
+        "model": "PC desktop",
+        "metadata_map": {"tier1_port": "0", "device_address_mask": "AAAAAA=="},
+        "public_ip": "192.0.2.10",
+        "device_aliases": {"1": {"display_name": f"Room {index}", "is_group": False, "id": "1"}},
+    }
+
+
+def cluster_frame(rng, track_ids, position, devices, active_device_id, timestamp, is_paused=False):
+    """Return a cluster update frame with the given track at the head of the queue."""
+    player_state = {
+        "timestamp": str(timestamp),
+        "context_uri": "spotify:playlist:37i9dQZF1DXcBWIGoYBM5M",
+        "context_url": "context://spotify:playlist:37i9dQZF1DXcBWIGoYBM5M",
+        "context_restrictions": {},
+        "play_origin": {"feature_identifier": "playlist", "feature_version": "web-player_2025-06-11"},
+        "index": {"page": 0, "track": position},
+        "track": _track(rng, track_ids[position]),
+        "playback_id": f"{rng.getrandbits(128):032x}",
+        "playback_speed": 1,
+        "position_as_of_timestamp": str(rng.randrange(0, 200000)),
+        "duration": str(rng.randrange(120000, 300000)),
+        "is_playing": True,
+        "is_paused": is_paused,
+        "is_system_initiated": False,
+        "options": {"shuffling_context": False, "repeating_context": False, "repeating_track": False},
+        "restrictions": {},
+        "suppressions": {},
+        "prev_tracks": [_track(rng, track_id) for track_id in track_ids[max(position - PREV_TRACKS, 0):position]],
+        "next_tracks": [_track(rng, track_id) for track_id in track_ids[position + 1:position + 1 + NEXT_TRACKS]],
+        "context_metadata": {"context_owner": "spotify", "playlist_volatile_context_id": "0"},
+        "page_metadata": {},
+        "session_id": f"{rng.getrandbits(64):016x}",
+        "queue_revision": str(rng.getrandbits(63)),
+    }
+    cluster = {
+        "timestamp": str(timestamp),
+        "active_device_id": active_device_id,
+        "player_state": player_state,
+        "devices": devices,
+        "transfer_data_timestamp": str(timestamp - 5000),
+        "not_playing_since_timestamp": "0",
+        "need_full_player_state": False,
+        "server_timestamp_ms": str(timestamp),
+    }
+    return json.dumps({
+        "headers": {"content-type": "application/json"},
+        "payloads": [{"update_reason": "DEVICE_STATE_CHANGED", "cluster": cluster, "devices_that_changed": [active_device_id]}],
+        "type": "message",
+        "method": "PUT",
+        "uri": "hm://connect-state/v1/cluster",
+    }, separators=(",", ":"))
+
+
+def account(seed=0):
+    """Return (rng, track_ids, devices) for a synthetic account."""
+    rng = random.Random(seed)
+    track_ids = [_track_id(rng) for _ in range(200)]
+    devices = dict(_device(rng, index) for index in range(8))
+    return rng, track_ids, devices
+
+
+def dealer_frames(count=200, seed=0):
+    """Return a list of raw dealer frames in the mix seen on a busy account.
+
+    Roughly half are cluster updates, the rest pongs and other hm:// messages
+    the integration ignores.
+    """
+    rng, track_ids, devices = account(seed)
+    active_device_id = next(iter(devices))
+    timestamp = 1750000000000
+    position = PREV_TRACKS
+
+    frames = []
+    for i in range(count):
+        kind = i % 4
+        timestamp += rng.randrange(50, 2000)
+        if kind in (0, 1):
+            if rng.random() < 0.1:
+                position = min(position + 1, max_position(track_ids))
+            frames.append(cluster_frame(rng, track_ids, position, devices, active_device_id, timestamp))
+        elif kind == 2:
+            frames.append('{"type":"pong"}')
+        else:
+            frames.append(json.dumps({
+                "headers": {"Transfer-Encoding": "gzip"},
+                "payloads": [f"{rng.getrandbits(256):064x}"],
+                "type": "message",
+                "uri": "hm://playlist/v2/user/example/rootlist",
+            }, separators=(",", ":")))
+    return frames
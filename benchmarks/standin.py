@@ -0,0 +1,209 @@
+"""Local stand-in for the Spotify endpoints the integration talks to.
+
+One aiohttp application serves the TOTP secrets, token, Web API, spclient
+and dealer websocket endpoints. Requests are addressed as
+http://127.0.0.1:<port>/<original host>/<original path>; RedirectingSession
+rewrites the integration's https:// and wss:// URLs into that form.
+"""
+
+import asyncio
+import json
+import time
+
+import aiohttp
+from aiohttp import web
+from yarl import URL
+
+from .payloads import PREV_TRACKS, account, cluster_frame, max_position
+
+SECRET = [12, 56, 76, 33, 88, 44, 88, 33, 78, 78, 11, 66, 22, 22, 55, 69, 54]
+
+
+class RedirectingSession(aiohttp.ClientSession):
+    """Client session that sends every request to the stand-in server."""
+
+    def __init__(self, base_url, **kwargs):
+        super().__init__(**kwargs)
+        self._base_url = URL(base_url)
+
+    def _request(self, method, str_or_url, **kwargs):
+        url = URL(str_or_url)
+        if url.host != self._base_url.host:
+            scheme = "ws" if url.scheme in ("ws", "wss") else "http"
+            url = self._base_url.with_scheme(scheme).with_path(f"/{url.host}{url.path}").with_query(url.query)
+        kwargs.pop("ssl", None)
+        return super()._request(method, url, **kwargs)
+
+
+def _track_metadata(track_id):
+    return {
+        "id": track_id,
+        "uri": f"spotify:track:{track_id}",
+        "name": f"Track {track_id[:6]}",
+        "duration_ms": 200000,
+        "artists": [{"id": "artist", "name": "Benchmark Artist"}],
+        "album": {
+            "id": "album",
+            "name": "Benchmark Album",
+            "images": [
+                {"url": f"https://i.scdn.co/image/{track_id}640", "height": 640, "width": 640},
+                {"url": f"https://i.scdn.co/image/{track_id}300", "height": 300, "width": 300},
+                {"url": f"https://i.scdn.co/image/{track_id}64", "height": 64, "width": 64},
+            ],
+        },
+    }
+
+
+class StandIn:
+    """Spotify stand-in with configurable response latency.
+
+    Connect-state commands update an in-memory player and push the
+    resulting cluster to every open dealer socket, like the real service.
+    """
+
+    def __init__(self, latency=0.0, seed=0):
+        self.latency = latency
+        self.requests = 0
+        self._rng, self._track_ids, self._devices = account(seed)
+        self._active_device_id = next(iter(self._devices))
+        self._position = PREV_TRACKS
+        self._is_paused = False
+        self._sockets = set()
+        self._runner = None
+        self.registered = asyncio.Event()
+
+    async def start(self):
+        """Start serving on a free local port and return the base url."""
+        app = web.Application(middlewares=[self._latency_middleware])
+        app.router.add_get("/raw.githubusercontent.com/{path:.*}", self._secrets)
+        app.router.add_get("/open.spotify.com/api/server-time", self._server_time)
+        app.router.add_get("/open.spotify.com/api/token", self._token)
+        app.router.add_get("/api.spotify.com/v1/me", self._profile)
+        app.router.add_get("/api.spotify.com/v1/tracks", self._tracks)
+        app.router.add_post("/gew1-spclient.spotify.com/connect-state/v1/player/command/{path:.*}", self._command)
+        app.router.add_put("/gew1-spclient.spotify.com/connect-state/v1/connect/volume/{path:.*}", self._volume)
+        app.router.add_post("/gew1-spclient.spotify.com/connect-state/v1/connect/transfer/{path:.*}", self._transfer)
+        app.router.add_post("/guc-spclient.spotify.com/track-playback/v1/devices", self._ok)
+        app.router.add_put("/guc-spclient.spotify.com/connect-state/v1/devices/{device_id}", self._register)
+        app.router.add_get("/gew1-dealer.spotify.com/", self._dealer)
+        app.router.add_get("/i.scdn.co/image/{image_id}", self._image)
+
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    async def stop(self):
+        for ws in list(self._sockets):
+            await ws.close()
+        await self._runner.cleanup()
+
+    def cluster(self):
+        """Return a cluster frame for the current player state."""
+        return cluster_frame(
+            self._rng,
+            self._track_ids,
+            self._position,
+            self._devices,
+            self._active_device_id,
+            int(time.time() * 1000),
+            is_paused=self._is_paused,
+        )
+
+    async def push(self, frame):
+        for ws in list(self._sockets):
+            await ws.send_str(frame)
+
+    async def replay(self, frames, rate=0):
+        """Send frames to every dealer socket, rate per second or as fast as possible."""
+        interval = 1 / rate if rate else 0
+        start = time.monotonic()
+        for i, frame in enumerate(frames):
+            await self.push(frame)
+            if interval:
+                await asyncio.sleep(max(start + (i + 1) * interval - time.monotonic(), 0))
+            elif i % 20 == 0:
+                await asyncio.sleep(0)
+
+    @web.middleware
+    async def _latency_middleware(self, request, handler):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return await handler(request)
+
+    async def _secrets(self, request):
+        return web.Response(text=json.dumps([{"version": 1, "secret": SECRET}]), content_type="text/plain")
+
+    async def _server_time(self, request):
+        return web.json_response({"serverTime": int(time.time())})
+
+    async def _token(self, request):
+        return web.json_response({
+            "clientId": "benchmark",
+            "accessToken": "benchmark-token",
+            "accessTokenExpirationTimestampMs": int((time.time() + 3600) * 1000),
+            "isAnonymous": False,
+        })
+
+    async def _profile(self, request):
+        return web.json_response({"id": "benchmark", "display_name": "Benchmark"})
+
+    async def _tracks(self, request):
+        ids = request.query.get("ids", "").split(",")
+        return web.json_response({"tracks": [_track_metadata(track_id) for track_id in ids if track_id]})
+
+    async def _command(self, request):
+        command = (await request.json(content_type=None))["command"]
+        endpoint = command["endpoint"]
+        if endpoint in ("pause", "resume"):
+            self._is_paused = endpoint == "pause"
+        elif endpoint == "skip_next":
+            self._position = min(self._position + 1, max_position(self._track_ids))
+        elif endpoint == "skip_prev":
+            self._position = max(self._position - 1, 0)
+        await self.push(self.cluster())
+        return web.json_response({"ack_id": "benchmark"})
+
+    async def _volume(self, request):
+        volume = (await request.json(content_type=None))["volume"]
+        device = self._devices[self._active_device_id]
+        device["volume"] = int(volume)
+        await self.push(self.cluster())
+        return web.json_response({})
+
+    async def _transfer(self, request):
+        self._active_device_id = request.match_info["path"].rsplit("/", 1)[-1]
+        await self.push(self.cluster())
+        return web.json_response({})
+
+    async def _ok(self, request):
+        return web.json_response({})
+
+    async def _register(self, request):
+        self.registered.set()
+        await self.push(self.cluster())
+        return web.json_response({})
+
+    async def _image(self, request):
+        return web.Response(body=b"\xff\xd8\xff" + bytes(4096), content_type="image/jpeg")
+
+    async def _dealer(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        await ws.send_str(json.dumps({
+            "headers": {"Spotify-Connection-Id": "benchmark-connection"},
+            "method": "PUT",
+            "type": "message",
+            "uri": "hm://pusher/v1/connections/benchmark-connection",
+        }))
+        self._sockets.add(ws)
+        try:
+            async for msg in ws:
+                if msg.type == aiohttp.WSMsgType.TEXT and json.loads(msg.data).get("type") == "ping":
+                    await ws.send_str('{"type":"pong"}')
+        finally:
+            self._sockets.discard(ws)
+        return ws
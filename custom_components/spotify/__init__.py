@@ -3,21 +3,33 @@
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
 
+from . import hub, services
 from .const import DOMAIN
 
-PLATFORMS = ["media_player"]
+PLATFORMS = ["media_player", "sensor"]
 
 async def async_setup(hass: HomeAssistant, config: dict):
     """Set up the spotify_free component."""
+    services.async_setup_services(hass)
     return True
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Set up media player from a config entry."""
+    if DOMAIN not in hass.data:
+        hass.data[DOMAIN] = hub.SpotifyHub(hass)
+    await hass.data[DOMAIN].async_add_account(entry)
+
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
     return True
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Unload a config entry."""
-    await hass.config_entries.async_forward_entry_unload(entry, "media_player")
-    return True
+    unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    if unload_ok:
+        spotify_hub = hass.data[DOMAIN]
+        await spotify_hub.async_remove_account(entry.entry_id)
+        if not spotify_hub.accounts:
+            hass.data.pop(DOMAIN)
+            await spotify_hub.async_close()
+    return unload_ok
@@ -0,0 +1,99 @@
+"""Media browser tree built from the cached library index."""
+
+from homeassistant.components.media_player import (
+    BrowseError,
+    BrowseMedia,
+    MediaClass,
+    MediaType,
+)
+
+LIBRARY_ROOT = "library://"
+
+# content id, title, media class of the children
+LIBRARY_CATEGORIES = (
+    ("library://playlists", "Playlists", MediaClass.PLAYLIST),
+    ("library://albums", "Saved albums", MediaClass.ALBUM),
+    ("library://recent", "Recently played", MediaClass.TRACK),
+)
+
+def context_media_id(context_uri, track_uri):
+    """Return a media id that plays track_uri inside context_uri."""
+    return f"{context_uri}#{track_uri}"
+
+def split_media_id(media_id):
+    """Return (context uri, track uri or None) for a media id."""
+    context_uri, _, track_uri = media_id.partition("#")
+    return context_uri, track_uri or None
+
+def _track_item(track, context_uri=None):
+    return BrowseMedia(
+        media_class=MediaClass.TRACK,
+        media_content_id=context_media_id(context_uri, track["uri"]) if context_uri else track["uri"],
+        media_content_type=MediaType.TRACK,
+        title=f"{track['name']} - {track['artist']}" if track["artist"] else track["name"],
+        can_play=True,
+        can_expand=False,
+        thumbnail=track["image"] or None,
+    )
+
+def _playlist_item(playlist, children=None):
+    return BrowseMedia(
+        media_class=MediaClass.PLAYLIST,
+        media_content_id=playlist["uri"],
+        media_content_type=MediaType.PLAYLIST,
+        title=playlist["name"],
+        can_play=True,
+        can_expand=True,
+        children=children,
+        children_media_class=MediaClass.TRACK,
+        thumbnail=playlist["image"] or None,
+    )
+
+def _album_item(album):
+    return BrowseMedia(
+        media_class=MediaClass.ALBUM,
+        media_content_id=album["uri"],
+        media_content_type=MediaType.ALBUM,
+        title=f"{album['name']} - {album['artist']}" if album["artist"] else album["name"],
+        can_play=True,
+        can_expand=False,
+        thumbnail=album["image"] or None,
+    )
+
+def _directory(content_id, title, children_media_class, children=None):
+    return BrowseMedia(
+        media_class=MediaClass.DIRECTORY,
+        media_content_id=content_id,
+        media_content_type="library",
+        title=title,
+        can_play=False,
+        can_expand=True,
+        children=children,
+        children_media_class=children_media_class,
+    )
+
+def build_item(library, media_content_id=None):
+    """Return the browse node for a content id, with its children."""
+    if media_content_id in (None, LIBRARY_ROOT):
+        return _directory(
+            LIBRARY_ROOT,
+            "Spotify",
+            MediaClass.DIRECTORY,
+            [_directory(content_id, title, media_class) for content_id, title, media_class in LIBRARY_CATEGORIES],
+        )
+    if media_content_id == "library://playlists":
+        return _directory(
+            media_content_id,
+            "Playlists",
+            MediaClass.PLAYLIST,
+            [_playlist_item(playlist) for playlist in library.playlists.values()],
+        )
+    if media_content_id == "library://albums":
+        return _directory(media_content_id, "Saved albums", MediaClass.ALBUM, [_album_item(album) for album in library.albums])
+    if media_content_id == "library://recent":
+        return _directory(media_content_id, "Recently played", MediaClass.TRACK, [_track_item(track) for track in library.recent])
+    if media_content_id.startswith("spotify:playlist:"):
+        playlist = library.playlists.get(media_content_id.split(":")[-1])
+        if playlist:
+            return _playlist_item(playlist, [_track_item(track, playlist["uri"]) for track in playlist["tracks"]])
+    raise BrowseError(f"Media not found: {media_content_id}")
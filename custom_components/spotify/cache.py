@@ -0,0 +1,122 @@
+"""In-memory caches for the Spotify Free integration."""
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+
+_LOGGER = logging.getLogger(__name__)
+
+_MISSING = object()
+
+class LRUCache:
+    """Bounded least-recently-used cache whose entries expire after ttl seconds."""
+
+    def __init__(self, maxsize, ttl):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self._data[key] = (time.monotonic() + self._ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def clear(self):
+        self._data.clear()
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return len(self._data)
+
+def _image_content_type(content):
+    if content.startswith(b"\x89PNG"):
+        return "image/png"
+    return "image/jpeg"
+
+class ImageCache:
+    """Image cache keyed by image id, in memory and optionally on disk.
+
+    The directory holds at most max_files images; the least recently used
+    ones are removed when it grows past that. Disk access runs in the
+    default executor.
+    """
+
+    def __init__(self, maxsize, ttl, directory=None, max_files=0):
+        self._memory = LRUCache(maxsize, ttl)
+        self._directory = directory
+        self._max_files = max_files
+
+    async def get(self, image_id):
+        """Return (content, content_type) for an image, or None if it isn't cached."""
+        image = self._memory.get(image_id)
+        if image is None and self._directory:
+            content = await asyncio.get_running_loop().run_in_executor(None, self._read, image_id)
+            if content is not None:
+                image = (content, _image_content_type(content))
+                self._memory.set(image_id, image)
+        return image
+
+    async def set(self, image_id, image):
+        self._memory.set(image_id, image)
+        if self._directory:
+            await asyncio.get_running_loop().run_in_executor(None, self._write, image_id, image[0])
+
+    def _path(self, image_id):
+        return os.path.join(self._directory, image_id)
+
+    def _read(self, image_id):
+        path = self._path(image_id)
+        try:
+            with open(path, "rb") as file:
+                content = file.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return content
+
+    def _write(self, image_id, content):
+        try:
+            os.makedirs(self._directory, exist_ok=True)
+            with open(self._path(image_id), "wb") as file:
+                file.write(content)
+        except OSError as e:
+            _LOGGER.warning("Could not cache image %s on disk: %s", image_id, e)
+            return
+
+        # Another write may be pruning at the same time, so files can vanish under us
+        entries = []
+        try:
+            for entry in os.scandir(self._directory):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    pass
+        except OSError:
+            return
+        if len(entries) > self._max_files:
+            entries.sort()
+            for _, path in entries[:len(entries) - self._max_files]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
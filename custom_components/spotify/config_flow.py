@@ -1,4 +1,5 @@
 from homeassistant import config_entries, exceptions
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 import voluptuous as vol
 from .const import DOMAIN
 from . import playback
@@ -11,13 +12,16 @@ DATA_SCHEMA = vol.Schema({
 async def validate_input(hass, data):
     sp_dc = data["sp_dc"]
 
-    sp = playback.Spotify(sp_dc)
-    access_token = await hass.async_add_executor_job(sp.get_access_token)
+    sp = playback.Spotify(sp_dc, async_get_clientsession(hass))
+    try:
+        access_token = await sp.get_access_token()
 
-    if not access_token:
-        raise InvalidCredentials
+        if not access_token:
+            raise InvalidCredentials
 
-    user_profile = await sp.get_user_profile()
+        user_profile = await sp.get_user_profile()
+    finally:
+        sp.close()
 
 
 
@@ -1 +1,100 @@
-DOMAIN = "spotify"
\ No newline at end of file
+DOMAIN = "spotify"
+
+# HTTP connection pool shared by every account's API requests
+CONNECTION_LIMIT = 32
+CONNECTION_LIMIT_PER_HOST = 8
+DNS_CACHE_TTL = 300
+KEEPALIVE_TIMEOUT = 60
+
+# Access tokens are treated as expired this many seconds early, and refreshed
+# in the background this many seconds before they expire
+TOKEN_EXPIRY_MARGIN = 60
+TOKEN_REFRESH_MARGIN = 300
+TOKEN_RETRY_DELAY = 60
+
+# One timer renews every account's token; account n renews n * STAGGER seconds
+# earlier, wrapping at SPREAD, and first connections start CONNECT_STAGGER apart
+TOKEN_CHECK_INTERVAL = 15
+TOKEN_REFRESH_STAGGER = 20
+TOKEN_REFRESH_SPREAD = 600
+CONNECT_STAGGER = 2
+
+# Track metadata cache, keyed by track id
+TRACK_CACHE_SIZE = 256
+TRACK_CACHE_TTL = 24 * 3600
+
+# Track lookups made within this many seconds are sent as one /v1/tracks request
+TRACK_BATCH_WINDOW = 0.05
+TRACK_BATCH_SIZE = 50
+# Number of queue entries around the current track whose metadata and artwork
+# are fetched ahead of time
+PREFETCH_TRACKS = 5
+PREFETCH_PREVIOUS_TRACKS = 1
+
+# Album art downloads, keyed by image id, in memory and on disk
+IMAGE_CACHE_SIZE = 32
+IMAGE_CACHE_TTL = 24 * 3600
+IMAGE_DISK_CACHE_SIZE = 500
+IMAGE_CACHE_DIR = f".cache/{DOMAIN}/images"
+# Smallest album art width that still looks sharp on a dashboard card
+IMAGE_MIN_SIZE = 300
+
+# Dispatcher signal fired by a config entry's websocket, formatted with the entry id
+SIGNAL_WEBSOCKET_UPDATE = "spotify_websocket_update_{}"
+
+# Websocket updates arriving within this many seconds of each other are merged
+# into one entity update, which is delayed by at most UPDATE_MAX_LATENCY
+UPDATE_COALESCE_WINDOW = 0.25
+UPDATE_MAX_LATENCY = 1.0
+
+# Dealer reconnects: immediate after a clean close, otherwise backing off from
+# RECONNECT_DELAY to RECONNECT_MAX_DELAY seconds. A connection that drops within
+# RECONNECT_DELAY of opening counts as a failure, so a flapping socket can't spin.
+RECONNECT_DELAY = 10
+RECONNECT_MAX_DELAY = 300
+
+# Seconds to wait for a command to show up in a cluster update before the
+# optimistic state is discarded
+COMMAND_ECHO_TIMEOUT = 5
+
+# Seconds the interpolated position may drift from a cluster before it is re-anchored
+POSITION_DRIFT_TOLERANCE = 1.0
+
+# Pages of a collection requested ahead of the consumer when streaming it
+PAGE_PREFETCH = 4
+
+# Web API requests per second allowed for one account, and the burst size
+API_RATE_LIMIT = 5
+API_RATE_BURST = 20
+# Retries of failed Web API requests
+API_MAX_ATTEMPTS = 4
+API_BACKOFF_BASE = 0.5
+API_BACKOFF_MAX = 8
+API_CALL_DEADLINE = 20
+
+# TOTP secret material for the token endpoint, cached on disk
+TOTP_SECRETS_URL = "https://raw.githubusercontent.com/xyloflake/spot-secrets-go/refs/heads/main/secrets/secretBytes.json"
+TOTP_SECRET_TTL = 24 * 3600
+TOTP_OFFSET_TTL = 6 * 3600
+
+STORAGE_VERSION = 1
+STORAGE_KEY_TOTP = f"{DOMAIN}.totp"
+STORAGE_KEY_LIBRARY = f"{DOMAIN}.library.{{}}"
+STORAGE_KEY_DEVICES = f"{DOMAIN}.devices.{{}}"
+
+# Connect devices; ids with this prefix are hidden control devices like ours
+HIDDEN_DEVICE_PREFIX = "hobs_"
+DEVICE_SAVE_DELAY = 10
+
+# Library index behind the media browser
+LIBRARY_REFRESH_INTERVAL = 15 * 60
+LIBRARY_RETRY_DELAY = 60
+LIBRARY_PLAYLIST_TRACKS = 500
+LIBRARY_RECENT_SIZE = 50
+
+# Batch command service: commands sent at once, and seconds before the rest are cancelled
+BATCH_CONCURRENCY = 8
+BATCH_DEADLINE = 10
+
+# Lowest match score play_by_name accepts; an exact name scores 2
+SEARCH_MIN_SCORE = 0.5
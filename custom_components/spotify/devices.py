@@ -0,0 +1,66 @@
+"""Registry of an account's Spotify Connect devices."""
+
+from homeassistant.helpers.storage import Store
+
+from .const import DEVICE_SAVE_DELAY, HIDDEN_DEVICE_PREFIX, STORAGE_KEY_DEVICES, STORAGE_VERSION
+
+class DeviceRegistry:
+    """Connect devices keyed by device id, with a reverse index by source name.
+
+    Only rebuilt when a device joins, leaves or is renamed, not on volume
+    changes. Devices sharing a display name get the start of their id
+    appended so each has its own source. The registry is stored, so sources
+    are available at boot before the first cluster arrives.
+    """
+
+    def __init__(self, hass, entry_id):
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY_DEVICES.format(entry_id))
+        self._loaded = False
+        self._devices = {}
+        self._names = {}
+        self._ids = {}
+        self.source_list = []
+
+    def __len__(self):
+        return len(self._names)
+
+    async def async_load(self):
+        """Load the stored devices once."""
+        if self._loaded:
+            return
+        self._loaded = True
+        data = await self._store.async_load() or {}
+        self._rebuild(data.get("devices", {}))
+
+    def update(self, devices):
+        """Update from the cluster's Device objects, returning True if the sources changed."""
+        current = {
+            device_id: device.name
+            for device_id, device in devices.items()
+            if not device_id.startswith(HIDDEN_DEVICE_PREFIX)
+        }
+        if current == self._devices:
+            return False
+        self._rebuild(current)
+        self._store.async_delay_save(lambda: {"devices": self._devices}, DEVICE_SAVE_DELAY)
+        return True
+
+    def name(self, device_id):
+        """Return the source name of a device."""
+        return self._names.get(device_id)
+
+    def device_id(self, name):
+        """Return the device id behind a source name."""
+        return self._ids.get(name)
+
+    def _rebuild(self, devices):
+        counts = {}
+        for name in devices.values():
+            counts[name] = counts.get(name, 0) + 1
+        self._devices = devices
+        self._names = {
+            device_id: name if counts[name] == 1 else f"{name} ({device_id[:6]})"
+            for device_id, name in devices.items()
+        }
+        self._ids = {name: device_id for device_id, name in self._names.items()}
+        self.source_list = sorted(self._ids)
@@ -0,0 +1,24 @@
+"""Diagnostics support for Spotify Free."""
+
+from homeassistant.components.diagnostics import async_redact_data
+
+from .const import DOMAIN
+
+TO_REDACT = {"sp_dc"}
+
+async def async_get_config_entry_diagnostics(hass, entry):
+    """Return timing and connection diagnostics for a config entry."""
+    entry_data = hass.data[DOMAIN].accounts[entry.entry_id]
+    spotify = entry_data["spotify"]
+    connection = entry_data["websocket"]
+
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "token_expires_in": spotify.token_expires_in,
+        "websocket": {
+            "running": connection.running,
+            "connected": connection.connected,
+            "devices": len(connection.devices),
+        },
+        "stats": spotify.stats.as_dict(),
+    }
@@ -0,0 +1,130 @@
+"""Shared network layer and supervision for every configured account."""
+
+import logging
+from datetime import timedelta
+
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.storage import Store
+
+from . import library, playback, websocket
+from .const import (
+    CONNECT_STAGGER,
+    IMAGE_CACHE_DIR,
+    STORAGE_KEY_TOTP,
+    STORAGE_VERSION,
+    TOKEN_CHECK_INTERVAL,
+    TOKEN_REFRESH_MARGIN,
+    TOKEN_REFRESH_SPREAD,
+    TOKEN_REFRESH_STAGGER,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+class SpotifyHub:
+    """Owns everything the accounts share and every task they run.
+
+    All accounts use one pooled HTTP session for API calls, one unlimited
+    session for their long-lived dealer sockets, one TOTP source and one
+    token refresh timer. Renewals are spread over TOKEN_REFRESH_SPREAD and
+    first connections CONNECT_STAGGER apart, so a dozen accounts don't hit
+    Spotify at the same moment. Removing the last account, or Home Assistant
+    stopping, closes it all.
+    """
+
+    def __init__(self, hass):
+        self.hass = hass
+        self.session = playback.create_session()
+        self.websocket_session = playback.create_session(unlimited=True)
+        # Secret material is the same for every account
+        self.totp = playback.TotpSource(
+            async_get_clientsession(hass), Store(hass, STORAGE_VERSION, STORAGE_KEY_TOTP)
+        )
+        self.accounts = {}
+        self.entities = []
+        self._refresh_tasks = {}
+        self._cancel_refresh_timer = async_track_time_interval(
+            hass, self._async_refresh_tokens, timedelta(seconds=TOKEN_CHECK_INTERVAL)
+        )
+        self._cancel_restart_listener = hass.bus.async_listen(
+            "spotify_websocket_restart", self._async_restart_connections
+        )
+        # Config entries aren't unloaded on shutdown, so close the sessions here
+        self._cancel_stop_listener = hass.bus.async_listen_once(
+            EVENT_HOMEASSISTANT_STOP, self._async_stop
+        )
+        self._closed = False
+
+    async def async_add_account(self, entry):
+        """Create the client and connection for a config entry and start connecting."""
+        spotify = playback.Spotify(
+            entry.data["sp_dc"],
+            self.session,
+            totp=self.totp,
+            image_cache_dir=self.hass.config.path(IMAGE_CACHE_DIR),
+            auto_refresh=False,
+        )
+        connection = websocket.SpotifyWebsocket(
+            self.hass, spotify, self.session, entry.entry_id, websocket_session=self.websocket_session
+        )
+        # Queue behind the accounts that are still opening their first connection
+        starting = sum(1 for account in self.accounts.values() if not account["websocket"].connected)
+        self.accounts[entry.entry_id] = {
+            "spotify": spotify,
+            "websocket": connection,
+            "library": library.LibraryIndex(self.hass, spotify, entry.entry_id),
+        }
+        await connection.start(delay=starting * CONNECT_STAGGER)
+        return self.accounts[entry.entry_id]
+
+    async def async_remove_account(self, entry_id):
+        """Stop an account's connection and cancel its pending work."""
+        account = self.accounts.pop(entry_id, None)
+        if account is None:
+            return
+        task = self._refresh_tasks.pop(entry_id, None)
+        if task:
+            task.cancel()
+        await account["websocket"].stop()
+        account["library"].close()
+        account["spotify"].close()
+
+    async def async_close(self):
+        """Stop every account and release the shared timer and sessions."""
+        if self._closed:
+            return
+        self._closed = True
+        for entry_id in list(self.accounts):
+            await self.async_remove_account(entry_id)
+        self._cancel_refresh_timer()
+        self._cancel_restart_listener()
+        if self._cancel_stop_listener:
+            self._cancel_stop_listener()
+            self._cancel_stop_listener = None
+        await self.session.close()
+        await self.websocket_session.close()
+
+    async def _async_stop(self, event):
+        self._cancel_stop_listener = None
+        await self.async_close()
+
+    @callback
+    def _async_refresh_tokens(self, now=None):
+        """Renew tokens close to expiry, each account at its own offset."""
+        for index, (entry_id, account) in enumerate(self.accounts.items()):
+            if entry_id in self._refresh_tasks:
+                continue
+            expires_in = account["spotify"].token_expires_in
+            offset = index * TOKEN_REFRESH_STAGGER % TOKEN_REFRESH_SPREAD
+            if expires_in is None or expires_in > TOKEN_REFRESH_MARGIN + offset:
+                continue
+            task = self._refresh_tasks[entry_id] = self.hass.async_create_background_task(
+                account["spotify"].renew_access_token(), f"spotify_token_refresh_{entry_id}"
+            )
+            task.add_done_callback(lambda _, entry_id=entry_id: self._refresh_tasks.pop(entry_id, None))
+
+    async def _async_restart_connections(self, event=None):
+        for account in list(self.accounts.values()):
+            await account["websocket"].restart()
@@ -0,0 +1,236 @@
+"""Locally cached index of an account's playlists, saved albums and recently played tracks."""
+
+import asyncio
+import logging
+import time
+
+from homeassistant.helpers.storage import Store
+
+from . import playback
+from .search import Document, SearchIndex
+from .const import (
+    LIBRARY_PLAYLIST_TRACKS,
+    LIBRARY_RECENT_SIZE,
+    LIBRARY_REFRESH_INTERVAL,
+    LIBRARY_RETRY_DELAY,
+    PAGE_PREFETCH,
+    STORAGE_KEY_LIBRARY,
+    STORAGE_VERSION,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+API_URL = "https://api.spotify.com/v1"
+
+def _track_entry(track):
+    artist = (track.get("artists") or [{}])[0]
+    return {
+        "uri": track.get("uri", ""),
+        "name": track.get("name", ""),
+        "artist": artist.get("name", ""),
+        "artist_uri": artist.get("uri", ""),
+        "image": playback.album_image_url(track),
+    }
+
+def _album_entry(album):
+    artist = (album.get("artists") or [{}])[0]
+    return {
+        "uri": album.get("uri", ""),
+        "name": album.get("name", ""),
+        "artist": artist.get("name", ""),
+        "artist_uri": artist.get("uri", ""),
+        "image": playback.image_url(album.get("images")),
+    }
+
+class LibraryIndex:
+    """Library listing served from a Store and refreshed incrementally.
+
+    Playlist tracks are only read again when the playlist's snapshot_id
+    changes, saved albums are paged newest first until a known one turns
+    up, and recently played tracks are requested after the last cursor.
+    The search index is kept in step with every load and refresh. A refresh
+    that only partly succeeded is still stored, and is retried after
+    LIBRARY_RETRY_DELAY instead of the full interval.
+    """
+
+    def __init__(self, hass, spotify, entry_id):
+        self.hass = hass
+        self._spotify = spotify
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY_LIBRARY.format(entry_id))
+        self._loaded = False
+        self._refresh_task = None
+        self.playlists = {}
+        self.albums = []
+        self.recent = []
+        self._recent_cursor = None
+        self.refreshed_at = 0
+        self._complete = False
+        # Whether an index has ever been stored; until then callers wait for a refresh
+        self.stored = False
+        self.search = SearchIndex()
+
+    async def async_load(self):
+        """Load the stored index once."""
+        if self._loaded:
+            return
+        self._loaded = True
+        data = await self._store.async_load()
+        self.stored = data is not None
+        data = data or {}
+        self.playlists = data.get("playlists", {})
+        self.albums = data.get("albums", [])
+        self.recent = data.get("recent", [])
+        self._recent_cursor = data.get("recent_cursor")
+        self.refreshed_at = data.get("refreshed_at", 0)
+        self._complete = data.get("complete", True)
+        self.search.sync(self._documents())
+
+    @property
+    def stale(self):
+        interval = LIBRARY_REFRESH_INTERVAL if self._complete else LIBRARY_RETRY_DELAY
+        return time.time() - self.refreshed_at > interval
+
+    async def async_refresh(self):
+        """Refresh the index, sharing one refresh between callers."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = self.hass.async_create_background_task(
+                self._async_refresh(), f"spotify_library_refresh_{self._store.key}"
+            )
+        await asyncio.shield(self._refresh_task)
+
+    def async_schedule_refresh(self):
+        """Start a background refresh when the index is stale."""
+        if self.stale and (self._refresh_task is None or self._refresh_task.done()):
+            self._refresh_task = self.hass.async_create_background_task(
+                self._async_refresh(), f"spotify_library_refresh_{self._store.key}"
+            )
+
+    def close(self):
+        if self._refresh_task and not self._refresh_task.done():
+            self._refresh_task.cancel()
+
+    async def _async_refresh(self):
+        await self.async_load()
+        self.refreshed_at = time.time()
+        try:
+            self._complete = all(await asyncio.gather(
+                self._refresh_playlists(), self._refresh_albums(), self._refresh_recent()
+            ))
+        except Exception as e:
+            _LOGGER.error(f"Library refresh failed: {e}")
+            self._complete = False
+            return
+        self.search.sync(self._documents())
+        await self._store.async_save({
+            "playlists": self.playlists,
+            "albums": self.albums,
+            "recent": self.recent,
+            "recent_cursor": self._recent_cursor,
+            "refreshed_at": self.refreshed_at,
+            "complete": self._complete,
+        })
+        self.stored = True
+
+    def _documents(self):
+        """Yield a search document for every playlist, album, artist and track."""
+        tracks = [track for playlist in self.playlists.values() for track in playlist["tracks"]]
+        tracks += self.recent
+        for playlist in self.playlists.values():
+            yield Document(playlist["uri"], "playlist", playlist["name"])
+        for album in self.albums:
+            yield Document(album["uri"], "album", album["name"])
+        for item in self.albums + tracks:
+            if item.get("artist_uri"):
+                yield Document(item["artist_uri"], "artist", item["artist"])
+        for track in tracks:
+            yield Document(track["uri"], "track", track["name"])
+
+    async def _fetch_items(self, url, limit=None, until=None):
+        """Stream a collection from url, returning (items, total) or None on failure.
+
+        Stops after limit items, or before the first item until() accepts.
+        Pages are only prefetched when no early stop is possible.
+        """
+        items = []
+        pages = self._spotify.iter_pages(url, prefetch=1 if until else PAGE_PREFETCH, max_items=limit)
+        try:
+            async for item in pages:
+                if until and until(item):
+                    break
+                items.append(item)
+        except playback.ApiError as e:
+            _LOGGER.warning(f"Library refresh incomplete: {e}")
+            return None
+        return items, pages.total
+
+    async def _refresh_playlists(self):
+        result = await self._fetch_items(f"{API_URL}/me/playlists?limit=50")
+        if result is None:
+            return False
+        complete = True
+        playlists = {}
+        for item in result[0]:
+            if not item:
+                continue
+            known = self.playlists.get(item["id"], {})
+            entry = {
+                "uri": item.get("uri", ""),
+                "name": item.get("name", ""),
+                "owner": (item.get("owner") or {}).get("display_name", ""),
+                "image": playback.image_url(item.get("images")),
+                "snapshot_id": item.get("snapshot_id"),
+                "tracks": known.get("tracks", []),
+            }
+            if known.get("snapshot_id") != entry["snapshot_id"]:
+                tracks = await self._fetch_items(
+                    f"{API_URL}/playlists/{item['id']}/tracks?limit=100"
+                    "&fields=items(track(uri,name,artists(name,uri),album(images))),next,total,limit,offset",
+                    limit=LIBRARY_PLAYLIST_TRACKS,
+                )
+                if tracks is None:
+                    # Keep the old tracks and snapshot so the next refresh tries again
+                    entry["snapshot_id"] = known.get("snapshot_id")
+                    complete = False
+                else:
+                    entry["tracks"] = [_track_entry(track["track"]) for track in tracks[0] if track.get("track")]
+            playlists[item["id"]] = entry
+        self.playlists = playlists
+        return complete
+
+    async def _refresh_albums(self):
+        known = {album["uri"] for album in self.albums}
+        result = await self._fetch_items(
+            f"{API_URL}/me/albums?limit=50", until=lambda item: item["album"]["uri"] in known
+        )
+        if result is None:
+            return False
+        items, total = result
+        albums = [_album_entry(item["album"]) for item in items]
+        if total is not None and len(albums) + len(self.albums) != total:
+            # Albums were removed, which paging from the newest can't see
+            result = await self._fetch_items(f"{API_URL}/me/albums?limit=50")
+            if result is None:
+                return False
+            self.albums = [_album_entry(item["album"]) for item in result[0]]
+        else:
+            self.albums = albums + self.albums
+        return True
+
+    async def _refresh_recent(self):
+        url = f"{API_URL}/me/player/recently-played?limit=50"
+        if self._recent_cursor:
+            url += f"&after={self._recent_cursor}"
+        response = await self._spotify.make_api_call("GET", url)
+        if not response or response["status_code"] != 200:
+            return False
+        page = response["data"]
+        self._recent_cursor = (page.get("cursors") or {}).get("after") or self._recent_cursor
+        recent = [_track_entry(item["track"]) for item in page.get("items", []) if item.get("track")]
+        seen = set()
+        merged = []
+        for entry in recent + self.recent:
+            if entry["uri"] not in seen:
+                seen.add(entry["uri"])
+                merged.append(entry)
+        self.recent = merged[:LIBRARY_RECENT_SIZE]
+        return True
@@ -1,4 +1,3 @@
-import asyncio
 import logging
 
 import voluptuous as vol
@@ -13,16 +12,27 @@ from homeassistant.const import (
     STATE_PAUSED,
     STATE_PLAYING,
 )
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import entity_platform
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.restore_state import RestoredExtraData, RestoreEntity
 import homeassistant.util.dt as dt_util
 
-from . import playback
-from . import websocket
-from .const import DOMAIN
+from . import browse_media, playback
+from .const import (
+    COMMAND_ECHO_TIMEOUT,
+    DOMAIN,
+    POSITION_DRIFT_TOLERANCE,
+    PREFETCH_PREVIOUS_TRACKS,
+    PREFETCH_TRACKS,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
 SUPPORT_SPOTIFY_FREE = (
-    MediaPlayerEntityFeature.NEXT_TRACK
+    MediaPlayerEntityFeature.BROWSE_MEDIA
+    | MediaPlayerEntityFeature.NEXT_TRACK
     | MediaPlayerEntityFeature.PAUSE
     | MediaPlayerEntityFeature.PLAY
     | MediaPlayerEntityFeature.PLAY_MEDIA
@@ -35,24 +45,63 @@ SUPPORT_SPOTIFY_FREE = (
     | MediaPlayerEntityFeature.VOLUME_MUTE
 )
 
+# Attributes saved on shutdown so the entity shows its last state at boot
+RESTORED_ATTRIBUTES = (
+    "_state",
+    "_track_id",
+    "_track_name",
+    "_track_artist",
+    "_track_album_name",
+    "_track_number",
+    "_media_image_url",
+    "_media_duration",
+    "_playlist",
+    "_volume",
+    "_is_muted",
+    "_shuffle_state",
+    "_repeating_context",
+    "_repeating_track",
+    "_current_device",
+    "_current_device_id",
+)
+
+# Everything else the entity shows; an update that changes none of these isn't written
+VISIBLE_ATTRIBUTES = RESTORED_ATTRIBUTES + (
+    "_current_position",
+    "_position_updated_at",
+    "_command_latency",
+    "_source_list",
+)
+
 PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend({
     vol.Required("sp_dc"): str,
 })
 
+SERVICE_PLAY_BY_NAME = "play_by_name"
+PLAY_BY_NAME_SCHEMA = {
+    vol.Required("name"): str,
+    vol.Optional("media_type"): vol.In(["track", "album", "artist", "playlist"]),
+}
+
 
 async def async_setup_entry(hass, entry, async_add_entities):
     name = entry.title
-    data = entry.data
-    entity = SpotifyFree(name, data, hass)
+    entry_data = hass.data[DOMAIN].accounts[entry.entry_id]
+    entity = SpotifyFree(name, hass, entry_data["spotify"], entry_data["websocket"], entry_data["library"])
     async_add_entities([entity])
 
+    platform = entity_platform.async_get_current_platform()
+    platform.async_register_entity_service(SERVICE_PLAY_BY_NAME, PLAY_BY_NAME_SCHEMA, "async_play_by_name")
+
 
-class SpotifyFree(MediaPlayerEntity):
-    def __init__(self, name, data, hass):
+class SpotifyFree(MediaPlayerEntity, RestoreEntity):
+    def __init__(self, name, hass, spotify, spotify_websocket, library):
         self._icon = "mdi:spotify"
-        self._sp_dc = data.get("sp_dc")
         self._name = name
         self.hass = hass
+        self.playback_instance = spotify
+        self.spotify_websocket = spotify_websocket
+        self.library = library
 
         self._track_info = None
         self._current_playback = None
@@ -62,119 +111,285 @@ class SpotifyFree(MediaPlayerEntity):
         self._track_album_name = None
         self._media_image_url = None
         self._current_position = None
+        self._position_updated_at = None
+        self._position_speed = 0
         self._media_duration = None
         self._volume = 0
         self._is_muted = False
         self._state = None
         self._repeat_state = None
+        self._repeating_context = False
+        self._repeating_track = False
         self._shuffle_state = None
         self._current_device = None
         self._current_device_id = None
-        self._devices = None
+        self._source_list = ()
         self._control_device = None
         self._track_number = None
         self._playlist = None       
-        self.spotify_websocket = None
-        self._devices = None
+        self._prefetch_ids = None
+        self._prefetch_task = None
+        self._pending_command = None
+        self._cancel_echo_timeout = None
+        self._command_latency = None
+        self._restored = False
         self._last_update = "1970-01-01T00:00:00+00:00"
 
-        asyncio.create_task(self.reconnect())
-
     async def async_added_to_hass(self):
-        self.playback_instance = playback.Spotify(self._sp_dc)
-        await self.websocket()
+        # Show the last known state until the connection delivers a cluster
+        extra_data = await self.async_get_last_extra_data()
+        if extra_data and self.spotify_websocket.state is None:
+            for key, value in extra_data.as_dict().items():
+                if f"_{key}" in RESTORED_ATTRIBUTES:
+                    setattr(self, f"_{key}", value)
+            self._restored = True
+
+        await self.spotify_websocket.start()
 
-        self.hass.bus.async_listen("spotify_websocket_update", self.update)
-        self.hass.bus.async_listen("spotify_websocket_restart", self.websocket)
+        # Only this entity's own connection triggers its updates
+        self.async_on_remove(
+            async_dispatcher_connect(self.hass, self.spotify_websocket.update_signal, self.update)
+        )
 
         await self.async_update()
 
-        if DOMAIN not in self.hass.data:
-            self.hass.data[DOMAIN] = {'entities': []}
-        self.hass.data[DOMAIN]['entities'].append(self)
+        entities = self.hass.data[DOMAIN].entities
+        entities.append(self)
+        self.async_on_remove(lambda: entities.remove(self))
 
-    async def reconnect(self):
-        while True:
-            try:
-                await asyncio.sleep(3600)
-                await self.websocket()
-            except Exception as e:
-                _LOGGER.error("WebSocket reconnect failed: %s", e)
-                await asyncio.sleep(30)
+    async def async_will_remove_from_hass(self):
+        if self._prefetch_task:
+            self._prefetch_task.cancel()
+        if self._cancel_echo_timeout:
+            self._cancel_echo_timeout()
 
     async def ensure_websocket(self):
-        if not self.spotify_websocket or self.spotify_websocket_task.done():
+        if not self.spotify_websocket.running:
             _LOGGER.warning("WebSocket disconnected. Attempting to reconnect.")
-            await self.websocket()
-
-    async def update(self, blah):
-        self._last_update = dt_util.utcnow()
-        await self.async_update()
-
-    async def websocket(self):
-        try:
-            if self.spotify_websocket:
-                self.spotify_websocket_task.cancel()
-
-            access_token = await self.playback_instance.get_access_token()
-            self.spotify_websocket = websocket.SpotifyWebsocket(self.hass, access_token)
-            self.spotify_websocket_task = self.hass.loop.create_task(
-                self.spotify_websocket.spotify_websocket()
+            await self.spotify_websocket.start()
+
+    async def update(self, changed):
+        before = self._visible_state()
+        # From the first signal on, availability follows the connection
+        self._restored = False
+        if (
+            self._pending_command
+            and not changed.isdisjoint(self._pending_command[1])
+            and not (self._pending_command[0] == "volume" and self._volume_pending())
+        ):
+            self._command_echoed()
+        await self._async_apply_state(changed)
+        if self._visible_state() != before:
+            self._last_update = dt_util.utcnow()
+            self.async_write_ha_state()
+
+    def _volume_pending(self):
+        # Echoes of earlier requests in a slider drag carry volumes the user has already moved past
+        return self.playback_instance.volume_pending(self._current_device_id)
+
+    def _visible_state(self):
+        return (self.available, self.spotify_websocket.connected) + tuple(
+            getattr(self, attr) for attr in VISIBLE_ATTRIBUTES
+        )
+
+    async def _async_command(self, name, command, optimistic, echo_fields):
+        """Run a playback command with optimistic state.
+
+        optimistic maps entity attributes to the values they should show
+        until Spotify confirms the command. The next cluster update touching
+        echo_fields reconciles them with the real state. If the command fails
+        or no echo arrives in time, the real state is restored.
+        """
+        await self.ensure_websocket()
+        previous = {attr: getattr(self, attr) for attr in optimistic}
+        for attr, value in optimistic.items():
+            setattr(self, attr, value)
+        if optimistic:
+            self.async_write_ha_state()
+
+        self._pending_command = (name, echo_fields, self.hass.loop.time())
+        self.spotify_websocket.expect_command_echo()
+        response = await command()
+
+        if not response or response["status_code"] >= 400:
+            _LOGGER.warning("%s command failed: %s", name, response)
+            if self._pending_command and self._pending_command[0] == name:
+                self._pending_command = None
+            for attr, value in previous.items():
+                setattr(self, attr, value)
+            await self._async_apply_state()
+            self.async_write_ha_state()
+            return
+
+        if self._pending_command and self._pending_command[0] == name:
+            if self._cancel_echo_timeout:
+                self._cancel_echo_timeout()
+            self._cancel_echo_timeout = async_call_later(
+                self.hass, COMMAND_ECHO_TIMEOUT, self._async_echo_timeout
             )
-            _LOGGER.info("WebSocket reconnected.")
-            await self.async_update()
-        except Exception as e:
-            _LOGGER.error("WebSocket setup failed: %s", e)
+
+    def _command_echoed(self):
+        name, _, sent_at = self._pending_command
+        self._pending_command = None
+        if self._cancel_echo_timeout:
+            self._cancel_echo_timeout()
+            self._cancel_echo_timeout = None
+        latency = self.hass.loop.time() - sent_at
+        self._command_latency = round(latency * 1000)
+        self.playback_instance.stats.record_latency(f"command_echo {name}", latency)
+        _LOGGER.debug("%s command echoed after %d ms", name, self._command_latency)
+
+    async def _async_echo_timeout(self, now):
+        self._cancel_echo_timeout = None
+        if not self._pending_command:
+            return
+        _LOGGER.warning("%s command was not confirmed by Spotify", self._pending_command[0])
+        self._pending_command = None
+        await self._async_apply_state()
+        self.async_write_ha_state()
 
     async def async_media_pause(self):
-        await self.ensure_websocket()
-        await self.playback_instance.pause(self._current_device_id)
+        await self._async_command(
+            "pause",
+            lambda: self.playback_instance.pause(self._current_device_id),
+            {"_state": False, **self._optimistic_position(self._position_now(), 0)},
+            ("is_playing", "is_paused"),
+        )
 
     async def async_media_play(self):
-        await self.ensure_websocket()
-        await self.playback_instance.resume(self._current_device_id)
+        await self._async_command(
+            "resume",
+            lambda: self.playback_instance.resume(self._current_device_id),
+            {"_state": True, **self._optimistic_position(self._position_now(), 1)},
+            ("is_playing", "is_paused"),
+        )
 
     async def async_media_previous_track(self):
-        await self.ensure_websocket()
-        await self.playback_instance.previous(self._current_device_id)
+        await self._async_command(
+            "skip_prev",
+            lambda: self.playback_instance.previous(self._current_device_id),
+            self._optimistic_position(0, self._position_speed),
+            ("track_uri", "position_ms"),
+        )
 
     async def async_media_next_track(self):
-        await self.ensure_websocket()
-        await self.playback_instance.next(self._current_device_id)
+        optimistic = self._optimistic_position(0, self._position_speed)
+        cluster = self.spotify_websocket.state
+        next_uris = cluster.player.next_track_uris if cluster else ()
+        if next_uris and next_uris[0].startswith("spotify:track:"):
+            # Show the next track straight away when its metadata was prefetched
+            track_id = next_uris[0].split(":")[-1]
+            track_info = self.playback_instance.get_cached_track(track_id)
+            if track_info:
+                optimistic.update(self._track_attributes(track_id, track_info))
+        await self._async_command(
+            "skip_next",
+            lambda: self.playback_instance.next(self._current_device_id),
+            optimistic,
+            ("track_uri",),
+        )
 
     async def async_media_seek(self, position):
-        await self.ensure_websocket()
-        await self.playback_instance.seek(self._current_device_id, seek_ms=int(position * 1000))
+        await self._async_command(
+            "seek_to",
+            lambda: self.playback_instance.seek(self._current_device_id, seek_ms=int(position * 1000)),
+            self._optimistic_position(position, self._position_speed),
+            ("position_ms",),
+        )
+
+    async def async_play_media(self, media_type, media_id, **kwargs):
+        if not media_id.startswith("spotify:"):
+            _LOGGER.warning("Unsupported media id: %s", media_id)
+            return
+        # Tracks picked inside a playlist carry the playlist, so playback continues through it
+        context_uri, track_uri = browse_media.split_media_id(media_id)
+        await self._async_command(
+            "play",
+            lambda: self.playback_instance.play(self._current_device_id, context_uri, track_uri),
+            {"_state": True},
+            ("track_uri", "context_uri", "is_playing", "is_paused"),
+        )
+
+    async def async_play_by_name(self, name, media_type=None):
+        await self._async_load_library()
+        match = self.library.search.lookup(name, media_type)
+        if match is None:
+            raise HomeAssistantError(f"Nothing in the Spotify library matches '{name}'")
+        _LOGGER.debug("Playing %s %s for '%s'", match.kind, match.uri, name)
+        await self.async_play_media(match.kind, match.uri)
+
+    async def async_browse_media(self, media_content_type=None, media_content_id=None):
+        await self._async_load_library()
+        return browse_media.build_item(self.library, media_content_id)
+
+    async def _async_load_library(self):
+        # Served from the stored index once there is one; a stale index is refreshed in the background
+        await self.library.async_load()
+        if not self.library.stored:
+            await self.library.async_refresh()
+        else:
+            self.library.async_schedule_refresh()
 
     async def async_set_repeat(self, repeat):
-        await self.ensure_websocket()
         repeat_map = {
             "off": (False, False),
             "all": (True, False),
             "one": (True, True),
         }
         context, track = repeat_map.get(repeat, (False, False))
-        await self.playback_instance.set_repeat(self._current_device_id, context, track)
+        await self._async_command(
+            "set_options",
+            lambda: self.playback_instance.set_repeat(self._current_device_id, context, track),
+            {"_repeating_context": context, "_repeating_track": track},
+            ("options",),
+        )
 
     async def async_set_shuffle(self, shuffle):
-        await self.ensure_websocket()
-        await self.playback_instance.set_shuffle(self._current_device_id, shuffle)
+        await self._async_command(
+            "set_shuffling_context",
+            lambda: self.playback_instance.set_shuffle(self._current_device_id, shuffle),
+            {"_shuffle_state": shuffle},
+            ("options",),
+        )
 
     async def async_set_volume_level(self, volume):
-        await self.ensure_websocket()
-        await self.playback_instance.volume(self._current_device_id, volume)
+        await self._async_command(
+            "volume",
+            lambda: self.playback_instance.volume(self._current_device_id, volume),
+            {"_volume": volume, "_is_muted": volume == 0},
+            ("devices",),
+        )
 
     async def async_mute_volume(self, mute):
-        await self.ensure_websocket()
         if self._is_muted:
-            await self.playback_instance.volume(self._current_device_id, self._old_volume)
+            volume = self._old_volume
         else:
             self._old_volume = self._volume
-            await self.playback_instance.volume(self._current_device_id, volume=0)
+            volume = 0
+        await self.async_set_volume_level(volume)
 
     async def async_select_source(self, source):
-        await self.ensure_websocket()
-        await self.playback_instance.select_device(self._devices[source])
+        device_id = self.spotify_websocket.devices.device_id(source)
+        if device_id is None:
+            raise HomeAssistantError(f"Unknown Spotify device '{source}'")
+        await self._async_command(
+            "transfer",
+            lambda: self.playback_instance.select_device(device_id),
+            {"_current_device": source, "_current_device_id": device_id},
+            ("active_device_id",),
+        )
+
+    @property
+    def should_poll(self):
+        return False
+
+    @property
+    def available(self):
+        return self._restored or self.spotify_websocket.connected
+
+    @property
+    def extra_restore_state_data(self):
+        return RestoredExtraData({attr[1:]: getattr(self, attr) for attr in RESTORED_ATTRIBUTES})
 
     @property
     def name(self):
@@ -210,6 +425,19 @@ class SpotifyFree(MediaPlayerEntity):
     def media_image_url(self):
         return self._media_image_url
 
+    @property
+    def media_image_hash(self):
+        # The image id is stable per artwork, so browsers can cache the proxied image
+        if self._media_image_url:
+            return playback.image_id(self._media_image_url)
+        return None
+
+    async def async_get_media_image(self):
+        if not self._media_image_url:
+            return None, None
+        image = await self.playback_instance.get_image(self._media_image_url)
+        return image or (None, None)
+
     @property
     def media_track(self):
         return self._track_number if hasattr(self, '_playlist') else None
@@ -226,7 +454,7 @@ class SpotifyFree(MediaPlayerEntity):
 
     @property
     def media_position_updated_at(self):
-        return self._last_update
+        return self._position_updated_at
 
     @property
     def volume_level(self):
@@ -259,68 +487,135 @@ class SpotifyFree(MediaPlayerEntity):
 
     @property
     def source_list(self):
-        if not self._devices:
-            return None
-        try:
-            return [key for key in self._devices if 'hobs' not in key]
-        except Exception as e:
-            _LOGGER.warning("Could not retrieve source list: %s", e)
-            return None
+        return self.spotify_websocket.devices.source_list or None
 
     @property
     def extra_state_attributes(self):
         return {
-            "websocket_connected": self.spotify_websocket and not self.spotify_websocket_task.done(),
+            "websocket_connected": self.spotify_websocket.connected,
             "last_update": str(self._last_update),
+            "command_latency_ms": self._command_latency,
         }
 
-    async def async_update(self, event=None):
+    async def async_update(self):
         await self.ensure_websocket()
-        self._state = self.spotify_websocket.response
-        if self._state:
-            try:                
-                cluster = self._state.get("payloads", [{}])[0].get("cluster", {})
-                player_state = cluster.get("player_state", {})
-
-                track = player_state.get("track", {})
-                self._track_id = track.get("uri", "").split(":")[-1]
-
-                response = await self.playback_instance.get_track_info(self._track_id)
-                self._track_info = response.get("data", {}).get("tracks", [{}])[0]
-
-                self._track_name = self._track_info.get("name", "")
-                self._track_album_name = self._track_info.get("album", {}).get("name", "")
-                self._media_image_url = self._track_info.get("album", {}).get("images", [{}])[0].get("url", "")
-                self._track_artist = self._track_info.get("artists", [{}])[0].get("name", "")
-
-                self._current_position = int(player_state.get("position_as_of_timestamp", 0)) / 1000
-                self._media_duration = int(player_state.get("duration", 0)) / 1000
-                self._state = player_state.get("is_playing", False) and not player_state.get("is_paused", True)
-
-                options = player_state.get("options", {})
-                self._shuffle_state = options.get("shuffling_context", False)
-                self._repeating_context = options.get("repeating_context", False)
-                self._repeating_track = options.get("repeating_track", False)
-
-                index = player_state.get("index", {})
-                self._track_number = index.get("track", 0)
-
-                self._current_device_id = cluster.get("active_device_id", "")
-                devices = cluster.get("devices", {})
-                current = devices.get(self._current_device_id, {})
-                self._volume = int(current.get("volume", 0)) / 65535
-                self._is_muted = self._volume == 0
+        await self._async_apply_state()
 
-                self._devices = self.spotify_websocket._devices
-                self._current_device = next(
-                    (name for name, id_ in self._devices.items() if id_ == self._current_device_id),
-                    None
-                )
+    def _position_now(self, now=None):
+        """Return the shown position extrapolated to now, in seconds."""
+        if self._current_position is None or self._position_updated_at is None:
+            return self._current_position
+        elapsed = ((now or dt_util.utcnow()) - self._position_updated_at).total_seconds()
+        position = self._current_position + max(elapsed, 0) * self._position_speed
+        if self._media_duration:
+            position = min(position, self._media_duration)
+        return position
+
+    @staticmethod
+    def _optimistic_position(position, speed):
+        return {
+            "_current_position": position,
+            "_position_updated_at": dt_util.utcnow(),
+            "_position_speed": speed,
+        }
 
-                self._playlist = "https://open.spotify.com/playlist/" + player_state.get("context_uri", "").split(":")[-1]
+    def _apply_position(self, cluster):
+        """Anchor the position at the cluster's server timestamp.
+
+        The current anchor is kept while it extrapolates to within
+        POSITION_DRIFT_TOLERANCE of the cluster, so frontends only see a new
+        position on seeks, track changes, pauses and real drift.
+        """
+        player = cluster.player
+        speed = player.playback_speed if player.is_advancing else 0
+        now = dt_util.utcnow()
+
+        expected = self._position_now(now)
+        actual = player.position_at(cluster.server_time_ms(now.timestamp())) / 1000
+        if (
+            expected is not None
+            and speed == self._position_speed
+            and abs(expected - actual) < POSITION_DRIFT_TOLERANCE
+        ):
+            return
+
+        anchored_at = now
+        if player.timestamp_ms:
+            sampled_at = dt_util.utc_from_timestamp((player.timestamp_ms - cluster.clock_offset_ms) / 1000)
+            anchored_at = min(sampled_at, now)
+        self._current_position = player.position_at(cluster.server_time_ms(anchored_at.timestamp())) / 1000
+        self._position_updated_at = anchored_at
+        self._position_speed = speed
+
+    @staticmethod
+    def _track_attributes(track_id, track_info):
+        """Return the entity attributes describing a track."""
+        info = track_info or {}
+        return {
+            "_track_id": track_id,
+            "_track_info": track_info,
+            "_track_name": info.get("name", ""),
+            "_track_album_name": info.get("album", {}).get("name", ""),
+            "_media_image_url": playback.album_image_url(info),
+            "_track_artist": (info.get("artists") or [{}])[0].get("name", ""),
+        }
 
+    async def _async_apply_state(self, changed=None):
+        """Copy the cluster state into entity attributes.
 
-            except Exception as e:
-                _LOGGER.error("Update Error: %s", e)
+        changed is the set of field names reported by ClusterState.apply, or
+        None to refresh everything.
+        """
+        cluster = self.spotify_websocket.state
+        if cluster is None:
+            return
+        player = cluster.player
+        try:
+            # Warm the caches for the tracks around this one so a skip is served locally
+            if changed is None or not changed.isdisjoint(("prev_track_uris", "next_track_uris")):
+                nearby_uris = (
+                    player.prev_track_uris[-PREFETCH_PREVIOUS_TRACKS:]
+                    + player.next_track_uris[:PREFETCH_TRACKS]
+                )
+                prefetch_ids = [
+                    uri.split(":")[-1] for uri in nearby_uris if uri.startswith("spotify:track:")
+                ]
+                if prefetch_ids != self._prefetch_ids:
+                    self._prefetch_ids = prefetch_ids
+                    self._prefetch_task = self.hass.async_create_task(
+                        self.playback_instance.prefetch(prefetch_ids)
+                    )
+
+            # Metadata only changes with the track, not on volume/seek/device events
+            # Episodes, local files and ads have no /v1/tracks metadata, so only tracks are looked up
+            is_track = player.track_uri.startswith("spotify:track:")
+            track_id = player.track_uri.split(":")[-1] if is_track else player.track_uri
+            if track_id != self._track_id or (is_track and not self._track_info):
+                track_info = await self.playback_instance.get_track(track_id) if is_track else None
+                for attr, value in self._track_attributes(track_id, track_info).items():
+                    setattr(self, attr, value)
+
+            self._media_duration = player.duration_ms / 1000
+            self._apply_position(cluster)
+            self._state = player.is_playing and not player.is_paused
+
+            self._shuffle_state = player.options.shuffling_context
+            self._repeating_context = player.options.repeating_context
+            self._repeating_track = player.options.repeating_track
+
+            self._track_number = player.track_index
+
+            self._current_device_id = cluster.active_device_id
+            current = cluster.active_device
+            if not self._volume_pending():
+                self._volume = current.volume / 65535 if current else 0
+                self._is_muted = self._volume == 0
 
-        self.async_write_ha_state()
+            self._current_device = self.spotify_websocket.devices.name(cluster.active_device_id)
+            # The registry is already updated when the notification arrives, so compare a copy
+            self._source_list = tuple(self.spotify_websocket.devices.source_list)
+
+            self._playlist = "https://open.spotify.com/playlist/" + player.context_uri.split(":")[-1]
+
+        except Exception as e:
+            _LOGGER.error("Update Error: %s", e)
@@ -5,10 +5,45 @@ import time
 import pyotp
 import base64
 import asyncio
-from random import randrange
+from collections import deque
+from random import randrange, uniform
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from .cache import ImageCache, LRUCache
+from .stats import Stats, endpoint_name
+from .const import (
+    API_BACKOFF_BASE,
+    API_BACKOFF_MAX,
+    API_CALL_DEADLINE,
+    API_MAX_ATTEMPTS,
+    API_RATE_BURST,
+    API_RATE_LIMIT,
+    CONNECTION_LIMIT,
+    CONNECTION_LIMIT_PER_HOST,
+    DNS_CACHE_TTL,
+    IMAGE_CACHE_SIZE,
+    IMAGE_CACHE_TTL,
+    IMAGE_DISK_CACHE_SIZE,
+    IMAGE_MIN_SIZE,
+    KEEPALIVE_TIMEOUT,
+    PAGE_PREFETCH,
+    TOKEN_EXPIRY_MARGIN,
+    TOKEN_REFRESH_MARGIN,
+    TOKEN_RETRY_DELAY,
+    TRACK_BATCH_SIZE,
+    TRACK_BATCH_WINDOW,
+    TRACK_CACHE_SIZE,
+    TRACK_CACHE_TTL,
+    TOTP_OFFSET_TTL,
+    TOTP_SECRET_TTL,
+    TOTP_SECRETS_URL,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
+class ApiError(Exception):
+    """A Web API request failed after its retries."""
+
 def retry_async(max_retries=3, base_delay=2, exceptions=(aiohttp.ClientError, asyncio.TimeoutError, OSError)):
     """A retry decorator for async functions with exponential backoff."""
     def decorator(func):
@@ -25,30 +60,345 @@ def retry_async(max_retries=3, base_delay=2, exceptions=(aiohttp.ClientError, as
         return wrapper
     return decorator
 
-class Spotify:
-    def __init__(self, sp_dc):
-        self._sp_dc = sp_dc
-        self._access_token = None
-        self._headers = {
-            "Authorization": f"Bearer {self._access_token}",
-            "App-Platform": "WebPlayer",
-            "Content-Type": "application/json"
-        }
+class RateLimiter:
+    """Token bucket shared by every Web API request made for one account.
+
+    A 429 response blocks the whole bucket until its Retry-After has passed.
+    Callers with a deadline are turned away instead of waiting, for a block
+    or for the bucket to refill, past it.
+    """
+
+    def __init__(self, rate=API_RATE_LIMIT, burst=API_RATE_BURST):
+        self._rate = rate
+        self._burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._blocked_until = 0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, deadline=None):
+        """Take a token, returning False if one can't be had before deadline."""
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                else:
+                    self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return True
+                    wait = (1 - self._tokens) / self._rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+    def block(self, seconds):
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+def _retry_delay(response, attempt):
+    """Return how long to wait before retrying, honouring Retry-After."""
+    if response is not None and response.status == 429:
+        try:
+            return float(response.headers.get("Retry-After", ""))
+        except ValueError:
+            pass
+    return min(API_BACKOFF_BASE * (2 ** attempt), API_BACKOFF_MAX) * uniform(0.5, 1.5)
+
+def random_user_agent():
+    return f"Mozilla/5.0 (Macintosh; Intel Mac OS X 10_{randrange(11, 15)}_{randrange(4, 9)}) AppleWebKit/{randrange(530, 537)}.{randrange(30, 37)} (KHTML, like Gecko) Chrome/{randrange(80, 105)}.0.{randrange(3000, 4500)}.{randrange(60, 125)} Safari/{randrange(530, 537)}.{randrange(30, 36)}"
+
+def create_connector(unlimited=False):
+    """Create a pooled connector with keep-alive and DNS caching.
+
+    Long-lived websockets hold their connection, so their connector is
+    created unlimited instead of sharing the API pool limits.
+    """
+    return aiohttp.TCPConnector(
+        limit=0 if unlimited else CONNECTION_LIMIT,
+        limit_per_host=0 if unlimited else CONNECTION_LIMIT_PER_HOST,
+        ttl_dns_cache=DNS_CACHE_TTL,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+    )
+
+def create_session(unlimited=False):
+    """Create a pooled HTTP session with keep-alive and DNS caching."""
+    return aiohttp.ClientSession(connector=create_connector(unlimited))
+
+def album_image_url(track, min_size=IMAGE_MIN_SIZE):
+    """Return the url of a track's album art, see image_url."""
+    return image_url((track or {}).get("album", {}).get("images"), min_size)
+
+def image_url(images, min_size=IMAGE_MIN_SIZE):
+    """Return the url of the smallest image at least min_size wide.
+
+    Falls back to the largest image when none is big enough, and returns an
+    empty string when there are no images.
+    """
+    if not images:
+        return ""
+    adequate = [image for image in images if (image.get("width") or 0) >= min_size]
+    if adequate:
+        image = min(adequate, key=lambda image: image.get("width") or 0)
+    else:
+        image = max(images, key=lambda image: image.get("width") or 0)
+    return image.get("url", "")
+
+def image_id(url):
+    """Return the image id at the end of an i.scdn.co url."""
+    return url.rstrip("/").rsplit("/", 1)[-1]
+
+class TrackFetcher:
+    """Collect track lookups for a short window and resolve them with one request.
+
+    Lookups for the same id share a future, and each batch is split into
+    requests of at most TRACK_BATCH_SIZE ids against /v1/tracks. Ids the
+    API answers with null are cached as an empty dict, so they aren't
+    looked up again.
+    """
+
+    def __init__(self, get_track_info, cache, window=TRACK_BATCH_WINDOW, batch_size=TRACK_BATCH_SIZE):
+        self._get_track_info = get_track_info
+        self._cache = cache
+        self._window = window
+        self._batch_size = batch_size
+        self._pending = {}
+        self._timer = None
+        self._tasks = set()
+
+    def fetch(self, track_id):
+        """Return a future resolving to the track metadata, or None on failure."""
+        future = self._pending.get(track_id)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._pending[track_id] = loop.create_future()
+            if len(self._pending) >= self._batch_size:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self._window, self._flush)
+        return future
+
+    def _flush(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        pending = list(self._pending.items())
+        self._pending = {}
+        for i in range(0, len(pending), self._batch_size):
+            task = asyncio.create_task(self._fetch_batch(pending[i:i + self._batch_size]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _fetch_batch(self, batch):
+        tracks = []
+        answered = False
+        try:
+            response = await self._get_track_info(",".join(track_id for track_id, _ in batch))
+            if response and response["status_code"] == 200 and isinstance(response["data"], dict):
+                tracks = response["data"].get("tracks") or []
+                answered = True
+            else:
+                _LOGGER.warning(f"Track lookup failed: {response}")
+        except Exception as e:
+            _LOGGER.error(f"Track lookup failed: {e}")
+
+        # Results come back in request order, with null for unknown ids
+        tracks = tracks + [None] * (len(batch) - len(tracks))
+        for (track_id, future), track in zip(batch, tracks):
+            if track:
+                self._cache.set(track_id, track)
+            elif answered:
+                self._cache.set(track_id, {})
+            if not future.done():
+                future.set_result(track)
+
+    def close(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        for future in self._pending.values():
+            future.cancel()
+        self._pending = {}
+        for task in self._tasks:
+            task.cancel()
+
+class VolumeCoalescer:
+    """Send volume changes with at most one request in flight per device.
+
+    While a request is running only the latest requested volume is kept, and
+    it is sent once the running request completes. Every caller gets the
+    response of the last request sent for its device.
+    """
+
+    def __init__(self, send):
+        self._send = send
+        self._targets = {}
+        self._workers = {}
+
+    async def set(self, device, volume):
+        self._targets[device] = volume
+        worker = self._workers.get(device)
+        if worker is None or worker.done():
+            worker = self._workers[device] = asyncio.create_task(self._run(device))
+        return await asyncio.shield(worker)
+
+    def pending(self, device):
+        """Return True while a volume for device is queued or being sent."""
+        worker = self._workers.get(device)
+        return device in self._targets or (worker is not None and not worker.done())
+
+    async def _run(self, device):
+        response = None
+        while device in self._targets:
+            try:
+                response = await self._send(device, self._targets.pop(device))
+            except Exception as e:
+                # Keep draining, a volume queued meanwhile must still be sent
+                _LOGGER.error(f"Volume change failed: {e}")
+                response = None
+        return response
+
+    def close(self):
+        self._targets.clear()
+        for worker in self._workers.values():
+            worker.cancel()
+
+def _with_offset(url, offset):
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    query["offset"] = str(offset)
+    return parts._replace(query=urlencode(query)).geturl()
+
+class PageIterator:
+    """Async iterator over the items of a paged Web API collection.
+
+    Once the first page gives total and limit, the following pages are
+    requested by offset, at most prefetch pages ahead of the consumer, so
+    only that window is ever held in memory. Cursor paged collections, whose
+    pages only link to the next one, are walked one page at a time. total is
+    set after the first page. Raises ApiError when a page can't be fetched.
+    """
+
+    def __init__(self, get_page, url, prefetch=PAGE_PREFETCH, max_items=None):
+        self._get_page = get_page
+        self._url = url
+        self._prefetch = prefetch
+        self._max_items = max_items
+        self.total = None
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        pages = self._pages()
+        yielded = 0
+        try:
+            async for page in pages:
+                for item in page.get("items", []):
+                    if self._max_items is not None and yielded >= self._max_items:
+                        return
+                    yielded += 1
+                    yield item
+        finally:
+            await pages.aclose()
+
+    async def _pages(self):
+        page = await self._get_page(self._url)
+        self.total = page.get("total")
+        yield page
+
+        next_url = page.get("next")
+        limit = page.get("limit")
+        if self.total is None or not limit or not next_url or "offset=" not in next_url:
+            while next_url:
+                page = await self._get_page(next_url)
+                yield page
+                next_url = page.get("next")
+            return
+
+        first_offset = page.get("offset", 0)
+        end = self.total if self._max_items is None else min(self.total, first_offset + self._max_items)
+        offsets = iter(range(first_offset + limit, end, limit))
+        pending = deque()
+        try:
+            while True:
+                while len(pending) < self._prefetch:
+                    offset = next(offsets, None)
+                    if offset is None:
+                        break
+                    pending.append(asyncio.create_task(self._get_page(_with_offset(next_url, offset))))
+                if not pending:
+                    return
+                yield await pending.popleft()
+        finally:
+            for task in pending:
+                task.cancel()
+
+class TotpSource:
+    """Compute the TOTP codes the token endpoint expects without extra requests.
+
+    The decoded secret and the offset between the local clock and Spotify's
+    server time are cached, and persisted to store (anything with
+    async_load/async_save, such as a Home Assistant Store) when one is given.
+    They are only fetched again once they are older than TOTP_SECRET_TTL and
+    TOTP_OFFSET_TTL, or after invalidate().
+    """
+
+    def __init__(self, session, store=None):
+        self._session = session
+        self._store = store
+        self._data = None
+        self._lock = asyncio.Lock()
+
+    async def generate(self):
+        """Return (totp, server_time, version)."""
+        async with self._lock:
+            if self._data is None:
+                self._data = (await self._store.async_load() if self._store else None) or {}
+
+            now = time.time()
+            changed = False
+            if now - self._data.get("secret_fetched_at", 0) > TOTP_SECRET_TTL:
+                secret = await self._fetch_secret()
+                if secret:
+                    self._data["version"], self._data["secret"] = secret
+                    self._data["secret_fetched_at"] = now
+                    changed = True
+                elif not self._data.get("secret"):
+                    raise Exception("Failed to fetch TOTP secrets")
+                else:
+                    _LOGGER.warning("Failed to refresh TOTP secrets, using cached version")
+
+            if now - self._data.get("offset_measured_at", 0) > TOTP_OFFSET_TTL:
+                offset = await self._measure_clock_offset()
+                if offset is not None:
+                    self._data["clock_offset"] = offset
+                    self._data["offset_measured_at"] = now
+                    changed = True
+                elif "clock_offset" not in self._data:
+                    raise Exception("Failed to fetch server time from Spotify")
 
-    async def get_random_user_agent(self):
-        return f"Mozilla/5.0 (Macintosh; Intel Mac OS X 10_{randrange(11, 15)}_{randrange(4, 9)}) AppleWebKit/{randrange(530, 537)}.{randrange(30, 37)} (KHTML, like Gecko) Chrome/{randrange(80, 105)}.0.{randrange(3000, 4500)}.{randrange(60, 125)} Safari/{randrange(530, 537)}.{randrange(30, 36)}"
+            if changed and self._store:
+                await self._store.async_save(dict(self._data))
 
-    @retry_async()
-    async def generate_totp(self):
-        url = "https://raw.githubusercontent.com/xyloflake/spot-secrets-go/refs/heads/main/secrets/secretBytes.json"
+        server_time = int(time.time() + self._data["clock_offset"])
+        return pyotp.TOTP(self._data["secret"]), server_time, self._data["version"]
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as resp:
-                if resp.status != 200:
-                    raise Exception(f"Failed to fetch TOTP secrets from GitHub. Status: {resp.status}")
-                text = await resp.text()
-                secrets_list = json.loads(text)
+    def invalidate(self):
+        """Fetch the secret and clock offset again on the next code."""
+        if self._data:
+            self._data["secret_fetched_at"] = 0
+            self._data["offset_measured_at"] = 0
 
+    @retry_async()
+    async def _fetch_secret(self):
+        async with self._session.get(TOTP_SECRETS_URL) as resp:
+            if resp.status != 200:
+                _LOGGER.error(f"Failed to fetch TOTP secrets from GitHub. Status: {resp.status}")
+                return None
+            text = await resp.text()
+            secrets_list = json.loads(text)
 
         # Pick the entry with the highest version
         latest_entry = max(secrets_list, key=lambda x: x["version"])
@@ -61,25 +411,91 @@ class Spotify:
         hex_str = utf8_bytes.hex()
         secret_bytes = bytes.fromhex(hex_str)
         b32_secret = base64.b32encode(secret_bytes).decode('utf-8')
-        totp = pyotp.TOTP(b32_secret)
+        return version, b32_secret
 
+    @retry_async()
+    async def _measure_clock_offset(self):
+        """Return Spotify server time minus local time, in seconds."""
         headers = {
             "Host": "open.spotify.com",
-            "User-Agent": await self.get_random_user_agent(),
+            "User-Agent": random_user_agent(),
             "Accept": "*/*",
         }
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get("https://open.spotify.com/api/server-time", headers=headers) as resp:
-                data = await resp.json()
-                server_time = data.get("serverTime")
-                if server_time is None:
-                    raise Exception("Failed to fetch server time from Spotify")
+        sent_at = time.time()
+        async with self._session.get("https://open.spotify.com/api/server-time", headers=headers) as resp:
+            data = await resp.json()
+        received_at = time.time()
 
-        return totp, server_time, version
+        server_time = data.get("serverTime")
+        if server_time is None:
+            _LOGGER.error("Failed to fetch server time from Spotify")
+            return None
+        return server_time - (sent_at + received_at) / 2
+
+class Spotify:
+    def __init__(self, sp_dc, session, track_cache_size=TRACK_CACHE_SIZE, totp=None, image_cache_dir=None, auto_refresh=True):
+        self._sp_dc = sp_dc
+        self._session = session
+        self._totp = totp or TotpSource(session)
+        self._track_cache = LRUCache(track_cache_size, TRACK_CACHE_TTL)
+        self._track_fetcher = TrackFetcher(self.get_track_info, self._track_cache)
+        self._image_cache = ImageCache(IMAGE_CACHE_SIZE, IMAGE_CACHE_TTL, image_cache_dir, IMAGE_DISK_CACHE_SIZE)
+        self._image_tasks = {}
+        self._volume_coalescer = VolumeCoalescer(self._send_volume)
+        self._rate_limiter = RateLimiter()
+        self.stats = Stats()
+        self._access_token = None
+        self._token_expires_at = 0
+        self._token_task = None
+        # Without auto_refresh the owner renews the token, see SpotifyHub
+        self._auto_refresh = auto_refresh
+        self._refresh_timer = None
+        self._refresh_task = None
+        self._headers = {
+            "Authorization": f"Bearer {self._access_token}",
+            "App-Platform": "WebPlayer",
+            "Content-Type": "application/json"
+        }
+
+    @property
+    def token_expires_in(self):
+        """Seconds until the cached access token expires, or None without one."""
+        if not self._access_token:
+            return None
+        return round(self._token_expires_at - time.time())
+
+    async def get_random_user_agent(self):
+        return random_user_agent()
+
+    async def generate_totp(self):
+        return await self._totp.generate()
 
-    @retry_async()
     async def get_access_token(self):
+        """Return the cached access token, fetching a new one once it expires."""
+        if self._access_token and time.time() < self._token_expires_at - TOKEN_EXPIRY_MARGIN:
+            return self._access_token
+        return await self.refresh_access_token()
+
+    async def refresh_access_token(self, stale_token=None):
+        """Fetch a new access token, sharing a single request between callers.
+
+        When stale_token is given and another caller has already replaced it,
+        the current token is returned without another fetch.
+        """
+        if stale_token and self._access_token and stale_token != self._access_token:
+            return self._access_token
+        if self._token_task is None or self._token_task.done():
+            self.stats.increment("token_refreshes")
+            started = time.monotonic()
+            self._token_task = asyncio.create_task(self._fetch_access_token())
+            self._token_task.add_done_callback(
+                lambda _: self.stats.record_latency("token_refresh", time.monotonic() - started)
+            )
+        return await asyncio.shield(self._token_task)
+
+    @retry_async()
+    async def _fetch_access_token(self):
         totp, server_time, totp_version = await self.generate_totp()
         otp_code = totp.at(int(server_time))
         timestamp_ms = int(time.time() * 1000)
@@ -104,50 +520,179 @@ class Spotify:
 
         url = "https://open.spotify.com/api/token"
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers, params=params) as resp:
-                data = await resp.json()
-                token = data.get("accessToken")
-                if token and await self.check_token_validity(token):
-                    self._access_token = token
-                    self._headers["Authorization"] = f"Bearer {token}"
-                    return token
-                _LOGGER.error(f"Token fetch failed or invalid: {data}")
+        async with self._session.get(url, headers=headers, params=params) as resp:
+            data = await resp.json()
+            token = data.get("accessToken")
+            # An invalid sp_dc cookie still yields a token, but an anonymous one
+            if token and not data.get("isAnonymous", False):
+                expires_ms = data.get("accessTokenExpirationTimestampMs")
+                self._access_token = token
+                self._token_expires_at = expires_ms / 1000 if expires_ms else time.time() + 3600
+                self._headers["Authorization"] = f"Bearer {token}"
+                self._schedule_refresh(self._token_expires_at - TOKEN_REFRESH_MARGIN - time.time())
+                return token
+            _LOGGER.error(f"Token fetch failed or invalid: {data}")
+        # The secret may have been rotated or the clock offset drifted
+        self._totp.invalidate()
         return None
 
+    def _schedule_refresh(self, delay):
+        """Refresh the token in the background after delay seconds."""
+        if not self._auto_refresh:
+            return
+        if self._refresh_timer:
+            self._refresh_timer.cancel()
+        self._refresh_timer = asyncio.get_running_loop().call_later(
+            max(delay, 0), self._start_background_refresh
+        )
+
+    def _start_background_refresh(self):
+        self._refresh_timer = None
+        self._refresh_task = asyncio.create_task(self._background_refresh())
+
+    async def _background_refresh(self):
+        if not await self.renew_access_token():
+            self._schedule_refresh(TOKEN_RETRY_DELAY)
+
+    async def renew_access_token(self):
+        """Replace the current token before it expires, returning None on failure."""
+        try:
+            return await self.refresh_access_token(stale_token=self._access_token)
+        except Exception as e:
+            _LOGGER.error(f"Background token refresh failed: {e}")
+            return None
+
+    def close(self):
+        """Cancel pending token refreshes, track lookups and image downloads."""
+        self._track_fetcher.close()
+        self._volume_coalescer.close()
+        for task in list(self._image_tasks.values()):
+            task.cancel()
+        if self._refresh_timer:
+            self._refresh_timer.cancel()
+            self._refresh_timer = None
+        for task in (self._token_task, self._refresh_task):
+            if task and not task.done():
+                task.cancel()
 
-    @retry_async()
     async def make_api_call(self, method, url, **kwargs):
-        if not self._access_token:
-            await self.get_access_token()
-
-        async with aiohttp.ClientSession() as session:
-            async with session.request(method, url, headers=self._headers, **kwargs) as response:
-                if response.status == 401:
-                    await self.get_access_token()
-                    async with session.request(method, url, headers=self._headers, **kwargs) as retry_response:
-                        data = await self._get_response_data(retry_response)
-                        return {"status_code": retry_response.status, "data": data}
-                data = await self._get_response_data(response)
-                return {"status_code": response.status, "data": data}
+        """Send a Web API request, retrying network errors, 429 and 5xx responses.
+
+        429 responses wait for Retry-After, other failures back off with
+        jitter, and no retry is started past API_CALL_DEADLINE. Returns the
+        last response received, or None if the request never got one.
+        """
+        with self.stats.timed(endpoint_name(method, url)):
+            return await self._make_api_call(method, url, **kwargs)
+
+    async def _make_api_call(self, method, url, **kwargs):
+        deadline = time.monotonic() + API_CALL_DEADLINE
+        token = await self.get_access_token()
+        refreshed = False
+        result = None
+
+        for attempt in range(API_MAX_ATTEMPTS):
+            if not await self._rate_limiter.acquire(deadline):
+                self.stats.increment("rate_limit_rejected")
+                _LOGGER.warning(f"{method} {url} not sent, rate limited past its deadline")
+                return result or {"status_code": 429, "data": None}
+            try:
+                async with self._session.request(method, url, headers=self._headers, **kwargs) as response:
+                    if response.status == 401 and not refreshed:
+                        self.stats.increment("status_401")
+                        refreshed = True
+                        token = await self.refresh_access_token(stale_token=token)
+                        continue
+                    result = {"status_code": response.status, "data": await self._get_response_data(response)}
+                    if response.status != 429 and response.status < 500:
+                        return result
+                    delay = _retry_delay(response, attempt)
+                    if response.status == 429:
+                        self.stats.increment("status_429")
+                        self._rate_limiter.block(delay)
+                    else:
+                        self.stats.increment("status_5xx")
+                    _LOGGER.warning(f"{method} {url} returned {response.status}, retrying in {delay:.1f}s")
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                self.stats.increment("network_errors")
+                delay = _retry_delay(None, attempt)
+                _LOGGER.warning(f"{method} {url} failed on attempt {attempt + 1}: {e}. Retrying in {delay:.1f}s...")
+
+            if attempt + 1 == API_MAX_ATTEMPTS or time.monotonic() + delay > deadline:
+                break
+            self.stats.increment("retries")
+            await asyncio.sleep(delay)
+
+        self.stats.increment("failed_requests")
+        _LOGGER.error(f"{method} {url} failed after {attempt + 1} attempts.")
+        return result
 
     async def _get_response_data(self, response):
         if response.content_type == "application/json":
             return await response.json()
         return await response.text()
 
-    @retry_async()
-    async def check_token_validity(self, token):
-        headers = {"Authorization": f"Bearer {token}"}
-        async with aiohttp.ClientSession() as session:
-            async with session.get("https://api.spotify.com/v1/me", headers=headers) as response:
-                return response.status == 200
+    async def get_page(self, url):
+        """Return one page of a collection, raising ApiError if it can't be fetched."""
+        response = await self.make_api_call("GET", url)
+        if not response or response["status_code"] != 200:
+            raise ApiError(f"GET {url} returned {response['status_code'] if response else 'no response'}")
+        return response["data"]
+
+    def iter_pages(self, url, prefetch=PAGE_PREFETCH, max_items=None):
+        """Stream the items of a paged collection, see PageIterator."""
+        return PageIterator(self.get_page, url, prefetch, max_items)
 
     async def get_user_profile(self):
         return await self.make_api_call("GET", "https://api.spotify.com/v1/me")
 
-    async def get_track_info(self, track_id):
-        return await self.make_api_call("GET", f"https://api.spotify.com/v1/tracks?ids={track_id}&market=from_token")
+    async def get_track_info(self, track_ids):
+        """Look up one or more comma separated track ids."""
+        return await self.make_api_call("GET", f"https://api.spotify.com/v1/tracks?ids={track_ids}&market=from_token")
+
+    def get_cached_track(self, track_id):
+        """Return cached metadata for a track without making a request."""
+        return self._track_cache.get(track_id) or None
+
+    async def get_track(self, track_id):
+        """Return metadata for a single track, served from the cache when possible."""
+        track = self._track_cache.get(track_id)
+        if track is not None:
+            return track or None
+        return await asyncio.shield(self._track_fetcher.fetch(track_id))
+
+    async def get_image(self, url):
+        """Return (content, content_type) for an image, served from the cache when possible."""
+        key = image_id(url)
+        image = await self._image_cache.get(key)
+        if image is not None:
+            return image
+        task = self._image_tasks.get(key)
+        if task is None:
+            task = self._image_tasks[key] = asyncio.create_task(self._download_image(url))
+            task.add_done_callback(lambda _: self._image_tasks.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _download_image(self, url):
+        # Cached outside the retried fetch so a failed disk write doesn't download again
+        image = await self._fetch_image(url)
+        if image is not None:
+            await self._image_cache.set(image_id(url), image)
+        return image
+
+    @retry_async()
+    async def _fetch_image(self, url):
+        async with self._session.get(url) as resp:
+            if resp.status != 200:
+                _LOGGER.warning(f"Failed to fetch image {url}. Status: {resp.status}")
+                return None
+            return (await resp.read(), resp.content_type)
+
+    async def prefetch(self, track_ids):
+        """Warm the metadata and artwork caches for the given tracks."""
+        tracks = await asyncio.gather(*(self.get_track(track_id) for track_id in track_ids))
+        urls = {album_image_url(track) for track in tracks if track}
+        await asyncio.gather(*(self.get_image(url) for url in urls if url))
 
     async def pause(self, device):
         data = {'command': {'endpoint': 'pause'}}
@@ -177,7 +722,21 @@ class Spotify:
         data = {'command': {'endpoint': 'set_options', 'repeating_context': context, 'repeating_track': track}}
         return await self.make_api_call("POST", f"https://gew1-spclient.spotify.com/connect-state/v1/player/command/from/random_string/to/{device}", data=json.dumps(data))
 
+    async def play(self, device, context_uri, track_uri=None):
+        """Play a context (playlist, album, artist or a single track), optionally from one of its tracks."""
+        data = {'command': {'endpoint': 'play', 'context': {'uri': context_uri, 'url': f'context://{context_uri}'}, 'options': {}}}
+        if track_uri:
+            data['command']['options']['skip_to'] = {'track_uri': track_uri}
+        return await self.make_api_call("POST", f"https://gew1-spclient.spotify.com/connect-state/v1/player/command/from/random_string/to/{device}", data=json.dumps(data))
+
     async def volume(self, device, volume):
+        return await self._volume_coalescer.set(device, volume)
+
+    def volume_pending(self, device):
+        """Return True while volume changes for device are still being sent."""
+        return self._volume_coalescer.pending(device)
+
+    async def _send_volume(self, device, volume):
         data = {'volume': volume * 65535}
         return await self.make_api_call("PUT", f"https://gew1-spclient.spotify.com/connect-state/v1/connect/volume/from/random_string/to/{device}", data=json.dumps(data))
 
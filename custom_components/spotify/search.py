@@ -0,0 +1,104 @@
+"""In-memory trigram index for finding library items by name."""
+
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+
+from .const import SEARCH_MIN_SCORE
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+def normalize(text):
+    """Casefold, strip accents and collapse punctuation to single spaces."""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return _NON_WORD.sub(" ", text).strip()
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+@dataclass(slots=True, frozen=True)
+class Document:
+    uri: str
+    kind: str
+    name: str
+
+class SearchIndex:
+    """Trigram inverted index over named library items.
+
+    Documents are keyed by uri. sync() applies only the difference from the
+    current set, so a library refresh doesn't rebuild the index. Lookups
+    rank candidates by trigram overlap (Dice coefficient) with a bonus for
+    exact and prefix matches.
+    """
+
+    def __init__(self):
+        self._documents = {}
+        self._trigrams = {}
+        self._names = {}
+        self._postings = defaultdict(set)
+
+    def __len__(self):
+        return len(self._documents)
+
+    def add(self, document):
+        if self._documents.get(document.uri) == document:
+            return
+        self.remove(document.uri)
+        name = normalize(document.name)
+        grams = trigrams(name)
+        self._documents[document.uri] = document
+        self._names[document.uri] = name
+        self._trigrams[document.uri] = grams
+        for gram in grams:
+            self._postings[gram].add(document.uri)
+
+    def remove(self, uri):
+        if self._documents.pop(uri, None) is None:
+            return
+        del self._names[uri]
+        for gram in self._trigrams.pop(uri):
+            postings = self._postings[gram]
+            postings.discard(uri)
+            if not postings:
+                del self._postings[gram]
+
+    def sync(self, documents):
+        """Make the index hold exactly documents, touching only what changed."""
+        documents = {document.uri: document for document in documents}
+        for uri in self._documents.keys() - documents.keys():
+            self.remove(uri)
+        for document in documents.values():
+            self.add(document)
+
+    def search(self, query, kind=None, limit=5):
+        """Return up to limit (score, document) pairs, best first."""
+        query = normalize(query)
+        grams = trigrams(query)
+        hits = Counter()
+        for gram in grams:
+            hits.update(self._postings.get(gram, ()))
+
+        results = []
+        for uri, count in hits.items():
+            document = self._documents[uri]
+            if kind and document.kind != kind:
+                continue
+            score = 2 * count / (len(grams) + len(self._trigrams[uri]))
+            name = self._names[uri]
+            if name == query:
+                score += 1
+            elif name.startswith(query):
+                score += 0.5
+            results.append((score, document))
+        results.sort(key=lambda result: result[0], reverse=True)
+        return results[:limit]
+
+    def lookup(self, query, kind=None):
+        """Return the best matching document, or None when nothing is close enough."""
+        results = self.search(query, kind, limit=1)
+        if results and results[0][0] >= SEARCH_MIN_SCORE:
+            return results[0][1]
+        return None
@@ -0,0 +1,75 @@
+"""Debug sensors exposing Spotify Free timing and connection counters."""
+
+from datetime import timedelta
+
+from homeassistant.components.sensor import SensorEntity, SensorStateClass
+from homeassistant.const import EntityCategory, UnitOfTime
+
+from .const import DOMAIN
+
+SCAN_INTERVAL = timedelta(seconds=30)
+
+# key, name, unit, state class, value function
+SENSORS = (
+    ("api_latency", "API latency", UnitOfTime.MILLISECONDS, SensorStateClass.MEASUREMENT,
+     lambda stats: round(stats.api_latency_ms, 1) if stats.api_latency_ms is not None else None),
+    ("api_retries", "API retries", None, SensorStateClass.TOTAL_INCREASING,
+     lambda stats: stats.counters["retries"]),
+    ("api_rate_limited", "API rate limited", None, SensorStateClass.TOTAL_INCREASING,
+     lambda stats: stats.counters["status_429"]),
+    ("websocket_messages", "Websocket messages", "messages/min", SensorStateClass.MEASUREMENT,
+     lambda stats: stats.message_rate),
+    ("websocket_reconnects", "Websocket reconnects", None, SensorStateClass.TOTAL_INCREASING,
+     lambda stats: stats.counters["websocket_disconnects"]),
+)
+
+
+async def async_setup_entry(hass, entry, async_add_entities):
+    stats = hass.data[DOMAIN].accounts[entry.entry_id]["spotify"].stats
+    async_add_entities(
+        SpotifyStatsSensor(entry, stats, *description) for description in SENSORS
+    )
+
+
+class SpotifyStatsSensor(SensorEntity):
+    """Debug sensor, disabled by default."""
+
+    def __init__(self, entry, stats, key, name, unit, state_class, value_fn):
+        self._stats = stats
+        self._unique_id = f"{entry.entry_id}_{key}"
+        self._name = f"{entry.title} {name}"
+        self._unit = unit
+        self._state_class = state_class
+        self._value_fn = value_fn
+        self._value = None
+
+    @property
+    def unique_id(self):
+        return self._unique_id
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def native_unit_of_measurement(self):
+        return self._unit
+
+    @property
+    def state_class(self):
+        return self._state_class
+
+    @property
+    def entity_category(self):
+        return EntityCategory.DIAGNOSTIC
+
+    @property
+    def entity_registry_enabled_default(self):
+        return False
+
+    @property
+    def native_value(self):
+        return self._value
+
+    async def async_update(self):
+        self._value = self._value_fn(self._stats)
@@ -0,0 +1,126 @@
+"""Domain services acting on several accounts and devices at once."""
+
+import asyncio
+import logging
+import time
+
+import voluptuous as vol
+
+from homeassistant.core import SupportsResponse
+from homeassistant.exceptions import HomeAssistantError
+import homeassistant.helpers.config_validation as cv
+
+from .const import BATCH_CONCURRENCY, BATCH_DEADLINE, DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_BATCH_COMMAND = "batch_command"
+
+# Connect-state commands the batch service can send, by service name
+BATCH_COMMANDS = {
+    "pause": lambda spotify, device, call: spotify.pause(device),
+    "resume": lambda spotify, device, call: spotify.resume(device),
+    "next": lambda spotify, device, call: spotify.next(device),
+    "previous": lambda spotify, device, call: spotify.previous(device),
+    "volume": lambda spotify, device, call: spotify.volume(device, call.data["volume_level"]),
+}
+
+BATCH_COMMAND_SCHEMA = vol.Schema({
+    vol.Required("command"): vol.In(list(BATCH_COMMANDS)),
+    vol.Optional("entity_id"): cv.entity_ids,
+    vol.Optional("devices"): vol.All(cv.ensure_list, [str]),
+    vol.Optional("volume_level"): vol.All(vol.Coerce(float), vol.Range(min=0, max=1)),
+})
+
+def async_setup_services(hass):
+    """Register the domain services."""
+
+    async def async_batch_command(call):
+        if call.data["command"] == "volume" and "volume_level" not in call.data:
+            raise HomeAssistantError("volume_level is required for the volume command")
+        spotify_hub = hass.data.get(DOMAIN)
+        if spotify_hub is None:
+            raise HomeAssistantError("No Spotify accounts are set up")
+        results = await run_batch(_targets(spotify_hub, call), BATCH_COMMANDS[call.data["command"]], call)
+        failed = sum(1 for result in results if not result["success"])
+        if failed:
+            _LOGGER.warning("%s failed for %d of %d targets", call.data["command"], failed, len(results))
+        return {"results": results}
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_BATCH_COMMAND,
+        async_batch_command,
+        schema=BATCH_COMMAND_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+def _targets(spotify_hub, call):
+    """Return (entity id, source name, Spotify client, device id) for every target of a call.
+
+    Named devices are only sent to the accounts that have them; a name no
+    account knows is reported once as an unknown device.
+    """
+    entity_ids = call.data.get("entity_id")
+    entities = [
+        entity for entity in spotify_hub.entities
+        if entity_ids is None or entity.entity_id in entity_ids
+    ]
+    targets = []
+    if "devices" in call.data:
+        for name in call.data["devices"]:
+            matches = [
+                (entity.entity_id, name, entity.playback_instance, entity.spotify_websocket.devices.device_id(name))
+                for entity in entities
+                if entity.spotify_websocket.devices.device_id(name)
+            ]
+            targets.extend(matches or [(None, name, None, None)])
+        return targets
+    for entity in entities:
+        connection = entity.spotify_websocket
+        device_id = connection.state.active_device_id if connection.state else None
+        targets.append((entity.entity_id, connection.devices.name(device_id), entity.playback_instance, device_id))
+    return targets
+
+async def run_batch(targets, command, call):
+    """Send command to every target, BATCH_CONCURRENCY at a time, within BATCH_DEADLINE.
+
+    Returns one result per target, in order, with the response status or
+    the reason it failed. Targets still running at the deadline are
+    cancelled and reported as timed out.
+    """
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    started = time.monotonic()
+    results = [
+        {"entity_id": entity_id, "device": name, "success": False}
+        for entity_id, name, _, _ in targets
+    ]
+
+    async def run(result, spotify, device_id):
+        if not device_id:
+            result["error"] = "no active device" if result["device"] is None else "unknown device"
+            return
+        async with semaphore:
+            response = await command(spotify, device_id, call)
+        result["elapsed_ms"] = round((time.monotonic() - started) * 1000)
+        if not response:
+            result["error"] = "no response"
+            return
+        result["status"] = response["status_code"]
+        result["success"] = response["status_code"] < 400
+
+    tasks = [
+        asyncio.create_task(run(result, spotify, device_id))
+        for result, (_, _, spotify, device_id) in zip(results, targets)
+    ]
+    if not tasks:
+        return results
+    _, pending = await asyncio.wait(tasks, timeout=BATCH_DEADLINE)
+    for task in pending:
+        task.cancel()
+    for result, task in zip(results, tasks):
+        if task in pending:
+            result["error"] = "timed out"
+        elif not task.cancelled() and task.exception():
+            result["error"] = str(task.exception())
+    return results
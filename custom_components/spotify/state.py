@@ -0,0 +1,135 @@
+"""Typed model of the connect-state cluster pushed over the dealer websocket."""
+
+import time
+from dataclasses import dataclass, field, fields
+
+@dataclass(slots=True)
+class PlaybackOptions:
+    shuffling_context: bool = False
+    repeating_context: bool = False
+    repeating_track: bool = False
+
+    @classmethod
+    def from_payload(cls, options):
+        return cls(
+            shuffling_context=bool(options.get("shuffling_context", False)),
+            repeating_context=bool(options.get("repeating_context", False)),
+            repeating_track=bool(options.get("repeating_track", False)),
+        )
+
+@dataclass(slots=True)
+class PlayerState:
+    track_uri: str = ""
+    context_uri: str = ""
+    is_playing: bool = False
+    is_paused: bool = True
+    position_ms: int = 0
+    duration_ms: int = 0
+    timestamp_ms: int = 0
+    playback_speed: float = 1.0
+    track_index: int = 0
+    prev_track_uris: tuple = ()
+    next_track_uris: tuple = ()
+    options: PlaybackOptions = field(default_factory=PlaybackOptions)
+
+    @classmethod
+    def from_payload(cls, player_state):
+        return cls(
+            track_uri=player_state.get("track", {}).get("uri", ""),
+            context_uri=player_state.get("context_uri", ""),
+            is_playing=bool(player_state.get("is_playing", False)),
+            is_paused=bool(player_state.get("is_paused", True)),
+            position_ms=int(player_state.get("position_as_of_timestamp", 0)),
+            duration_ms=int(player_state.get("duration", 0)),
+            timestamp_ms=int(player_state.get("timestamp", 0)),
+            playback_speed=float(player_state.get("playback_speed", 1)),
+            track_index=int(player_state.get("index", {}).get("track", 0)),
+            prev_track_uris=tuple(track.get("uri", "") for track in player_state.get("prev_tracks", [])),
+            next_track_uris=tuple(track.get("uri", "") for track in player_state.get("next_tracks", [])),
+            options=PlaybackOptions.from_payload(player_state.get("options", {})),
+        )
+
+    @property
+    def is_advancing(self):
+        return self.is_playing and not self.is_paused and self.playback_speed > 0
+
+    def position_at(self, server_ms):
+        """Return the position in ms at server time server_ms, extrapolated from timestamp_ms."""
+        position = self.position_ms
+        if self.is_advancing and self.timestamp_ms:
+            position += max(server_ms - self.timestamp_ms, 0) * self.playback_speed
+        if self.duration_ms:
+            position = min(position, self.duration_ms)
+        return position
+
+@dataclass(slots=True, frozen=True)
+class Device:
+    device_id: str
+    name: str
+    volume: int = 0
+
+    @classmethod
+    def from_payload(cls, device_id, device_info):
+        aliases = device_info.get("device_aliases", {})
+        alias_id = next(iter(aliases), None)
+        name = aliases[alias_id].get("display_name") if alias_id else None
+        if not name:
+            name = device_info.get("name") or device_id
+        return cls(device_id=device_id, name=name, volume=int(device_info.get("volume", 0)))
+
+# Fields that move on every message without changing what Home Assistant shows
+_SILENT_FIELDS = frozenset({"timestamp_ms"})
+
+@dataclass(slots=True)
+class ClusterState:
+    player: PlayerState = field(default_factory=PlayerState)
+    active_device_id: str = ""
+    devices: dict = field(default_factory=dict)
+    # Server clock minus local clock, from the cluster's server_timestamp_ms
+    clock_offset_ms: float = 0.0
+
+    @property
+    def active_device(self):
+        return self.devices.get(self.active_device_id)
+
+    def server_time_ms(self, local_time=None):
+        """Return the server time in ms for a local unix time, defaulting to now."""
+        if local_time is None:
+            local_time = time.time()
+        return local_time * 1000 + self.clock_offset_ms
+
+    def apply(self, cluster):
+        """Apply a cluster payload and return the names of the fields that changed.
+
+        Player fields are reported by name, plus "active_device_id" and
+        "devices" when the active device or any device changed.
+        """
+        changed = set()
+
+        server_timestamp_ms = cluster.get("server_timestamp_ms")
+        if server_timestamp_ms:
+            self.clock_offset_ms = int(server_timestamp_ms) - time.time() * 1000
+
+        player = PlayerState.from_payload(cluster.get("player_state", {}))
+        for player_field in fields(PlayerState):
+            name = player_field.name
+            value = getattr(player, name)
+            if getattr(self.player, name) != value:
+                setattr(self.player, name, value)
+                if name not in _SILENT_FIELDS:
+                    changed.add(name)
+
+        active_device_id = cluster.get("active_device_id", "")
+        if active_device_id != self.active_device_id:
+            self.active_device_id = active_device_id
+            changed.add("active_device_id")
+
+        devices = {
+            device_id: Device.from_payload(device_id, device_info)
+            for device_id, device_info in cluster.get("devices", {}).items()
+        }
+        if devices != self.devices:
+            self.devices = devices
+            changed.add("devices")
+
+        return changed
@@ -0,0 +1,106 @@
+"""Timing and counter instrumentation for the API and websocket paths."""
+
+import time
+from bisect import bisect_left
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Window over which the websocket message rate is computed, in seconds
+MESSAGE_RATE_WINDOW = 60
+
+# Path segments followed by an id, which is collapsed so each endpoint gets one histogram
+ID_COLLECTIONS = frozenset({"albums", "artists", "devices", "episodes", "playlists", "shows", "tracks", "users"})
+
+def endpoint_name(method, url):
+    """Return a stable name for a request, without ids or query strings."""
+    path = urlsplit(url).path
+    # Connect-state commands end in /from/<device>/to/<device>
+    segments = path.split("/from/", 1)[0].split("/")
+    for i in range(1, len(segments)):
+        if segments[i - 1] in ID_COLLECTIONS and segments[i]:
+            segments[i] = "{id}"
+    return f"{method} {'/'.join(segments)}"
+
+class LatencyHistogram:
+    __slots__ = ("buckets", "count", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, ms):
+        self.buckets[bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    @property
+    def mean_ms(self):
+        return self.total_ms / self.count if self.count else None
+
+    def as_dict(self):
+        labels = [f"<={bound}" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}"]
+        return {
+            "count": self.count,
+            "mean_ms": round(self.mean_ms, 1) if self.count else None,
+            "max_ms": round(self.max_ms, 1),
+            "buckets_ms": dict(zip(labels, self.buckets)),
+        }
+
+class Stats:
+    """Latency histograms and counters for one account."""
+
+    def __init__(self):
+        self.latency = defaultdict(LatencyHistogram)
+        self.counters = defaultdict(int)
+        self._message_times = deque()
+
+    def record_latency(self, name, seconds):
+        self.latency[name].record(seconds * 1000)
+
+    @contextmanager
+    def timed(self, name):
+        """Record how long the body of the with block takes under name."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record_latency(name, time.monotonic() - start)
+
+    def increment(self, name, amount=1):
+        self.counters[name] += amount
+
+    def record_message(self):
+        now = time.monotonic()
+        self.counters["websocket_messages"] += 1
+        self._message_times.append(now)
+        while self._message_times[0] < now - MESSAGE_RATE_WINDOW:
+            self._message_times.popleft()
+
+    @property
+    def message_rate(self):
+        """Websocket messages per minute over the last MESSAGE_RATE_WINDOW seconds."""
+        now = time.monotonic()
+        while self._message_times and self._message_times[0] < now - MESSAGE_RATE_WINDOW:
+            self._message_times.popleft()
+        return len(self._message_times) * 60 / MESSAGE_RATE_WINDOW
+
+    @property
+    def api_latency_ms(self):
+        """Mean latency over all Web API requests."""
+        histograms = [hist for name, hist in self.latency.items() if name.startswith(("GET ", "POST ", "PUT ", "DELETE "))]
+        count = sum(hist.count for hist in histograms)
+        return sum(hist.total_ms for hist in histograms) / count if count else None
+
+    def as_dict(self):
+        return {
+            "latency": {name: hist.as_dict() for name, hist in sorted(self.latency.items())},
+            "counters": dict(sorted(self.counters.items())),
+            "websocket_messages_per_minute": self.message_rate,
+        }
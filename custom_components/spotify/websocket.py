@@ -1,34 +1,87 @@
 import aiohttp
 import asyncio
-import json
 import random
 import string
 import logging
+import time
 from aiohttp import WSMsgType, ClientResponseError
 import ssl
 
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+
+from .const import (
+    HIDDEN_DEVICE_PREFIX,
+    RECONNECT_DELAY,
+    RECONNECT_MAX_DELAY,
+    SIGNAL_WEBSOCKET_UPDATE,
+    UPDATE_COALESCE_WINDOW,
+    UPDATE_MAX_LATENCY,
+)
+from .devices import DeviceRegistry
+from .state import ClusterState
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 ssl_context = ssl.create_default_context()
 
 _LOGGER = logging.getLogger(__name__)
 
+# Cluster updates are the only frames process() uses, so anything without
+# this key (pongs, pusher and other hm:// messages) is dropped undecoded
+_CLUSTER_MARKER = '"cluster"'
+
+def decode_message(data):
+    """Decode a dealer frame, or return None for frames that carry no cluster."""
+    if _CLUSTER_MARKER not in data:
+        return None
+    return json_loads(data)
+
 class SpotifyWebsocket:
-    def __init__(self, hass, access_token):
+    """Long-lived dealer connection shared by everything using one account.
+
+    The control device id is generated once and reused on every reconnect,
+    and each connection picks up the current access token from the client.
+    """
+
+    def __init__(
+        self,
+        hass,
+        spotify,
+        session,
+        entry_id,
+        coalesce_window=UPDATE_COALESCE_WINDOW,
+        max_latency=UPDATE_MAX_LATENCY,
+        websocket_session=None,
+    ):
         """Initialize the websocket."""
         self.hass = hass
-        self.access_token = access_token
+        self._spotify = spotify
+        self._stats = spotify.stats
+        self._session = session
+        self._websocket_session = websocket_session or session
+        self.update_signal = SIGNAL_WEBSOCKET_UPDATE.format(entry_id)
+        self._coalesce_window = coalesce_window
+        self._max_latency = max_latency
+        self._pending_changes = set()
+        self._pending_since = None
+        self._flush_timer = None
+        self._expect_echo = False
+        self.access_token = None
         self.connection_id = None
-        self.device_id = None
+        self.device_id = ''.join(random.choices(string.ascii_letters, k=40))
         self.ws = None
-        self._devices = {}
-        self.response = None
+        self.devices = DeviceRegistry(hass, entry_id)
+        self.state = None
         self._ping_task = None
         self._websocket_task = None
         self._reconnect_task = None
-        self._reconnect_delay = 10
+        self._restart_requested = False
 
     async def create_device(self):
-        """Create control device."""
-        self.device_id = ''.join(random.choices(string.ascii_letters, k=40))
+        """Register the control device for the current connection."""
         url = "https://guc-spclient.spotify.com/track-playback/v1/devices"
         headers = {
             "Authorization": f"Bearer {self.access_token}",
@@ -57,8 +110,8 @@ class SpotifyWebsocket:
         }
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=payload, headers=headers) as response:
+            with self._stats.timed("create_device"):
+                async with self._session.post(url, json=payload, headers=headers) as response:
                     response.raise_for_status()
                     return self.device_id
         except aiohttp.ClientError as err:
@@ -67,7 +120,7 @@ class SpotifyWebsocket:
 
     async def update_device_state(self):
         """Register devices for Spotify player updates."""
-        url = f"https://guc-spclient.spotify.com/connect-state/v1/devices/hobs_{self.device_id}"
+        url = f"https://guc-spclient.spotify.com/connect-state/v1/devices/{HIDDEN_DEVICE_PREFIX}{self.device_id}"
 
         headers = {
             "Authorization": f"Bearer {self.access_token}",
@@ -88,8 +141,8 @@ class SpotifyWebsocket:
         }
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.put(url, json=payload, headers=headers) as response:
+            with self._stats.timed("update_device_state"):
+                async with self._session.put(url, json=payload, headers=headers) as response:
                     response.raise_for_status()
         except aiohttp.ClientError as err:
             _LOGGER.error(f"Error updating device state: {err}")
@@ -104,66 +157,162 @@ class SpotifyWebsocket:
                 break
             await asyncio.sleep(30)
 
-    async def start(self):
-        """Start and manage persistent WebSocket connection."""
-        if self._reconnect_task and not self._reconnect_task.done():
+    @property
+    def running(self):
+        return self._reconnect_task is not None and not self._reconnect_task.done()
+
+    @property
+    def connected(self):
+        return self.ws is not None and not self.ws.closed
+
+    async def start(self, delay=0):
+        """Start and manage persistent WebSocket connection, first connecting after delay seconds."""
+        if self.running:
             _LOGGER.debug("WebSocket already running.")
             return
 
-        self._reconnect_task = asyncio.create_task(self._connect_loop())
+        await self.devices.async_load()
 
-    async def _connect_loop(self):
-        """Persistent reconnect loop for WebSocket."""
+        self._reconnect_task = self.hass.async_create_background_task(
+            self._connect_loop(delay), f"{self.update_signal}_connection"
+        )
+
+    async def restart(self):
+        """Drop the current connection and let the reconnect loop open a new one."""
+        if self.connected:
+            self._restart_requested = True
+            await self.ws.close()
+        else:
+            await self.start()
+
+    async def stop(self):
+        """Close the connection and stop reconnecting."""
+        if self._reconnect_task:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        if self._flush_timer:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if self.connected:
+            await self.ws.close()
+
+    async def _connect_loop(self, delay=0):
+        """Persistent reconnect loop for WebSocket.
+
+        A requested restart or a clean close of an established connection,
+        such as the dealer dropping an expired token, reconnects straight
+        away with the current token. Failures back off exponentially.
+        """
+        if delay:
+            await asyncio.sleep(delay)
+        failures = 0
         while True:
+            started = time.monotonic()
+            self._restart_requested = False
             try:
                 await self.spotify_websocket()
+                clean = self._restart_requested or time.monotonic() - started >= RECONNECT_DELAY
             except Exception as e:
-                _LOGGER.error(f"WebSocket crashed, reconnecting in {self._reconnect_delay}s: {e}")
-                await asyncio.sleep(self._reconnect_delay)
+                _LOGGER.error(f"WebSocket crashed: {e}")
+                clean = False
+            failures = 0 if clean else failures + 1
+            delay = min(RECONNECT_DELAY * 2 ** (failures - 1), RECONNECT_MAX_DELAY) if failures else 0
+            _LOGGER.info(f"WebSocket disconnected, reconnecting in {delay}s")
+            self._stats.increment("websocket_disconnects")
+            async_dispatcher_send(self.hass, self.update_signal, {"connection"})
+            if delay:
+                await asyncio.sleep(delay)
 
     async def spotify_websocket(self):
         """Create and manage the Spotify websocket connection."""
+        self.access_token = await self._spotify.get_access_token()
+        if not self.access_token:
+            raise Exception("No access token available")
+
         uri = f"wss://gew1-dealer.spotify.com/?access_token={self.access_token}"
         _LOGGER.info("Attempting Spotify WebSocket connection...")
 
-        async with aiohttp.ClientSession() as session:
-            async with session.ws_connect(uri, ssl=ssl_context) as ws:
-                self.ws = ws
-                msg = await ws.receive()
-                if msg.type == WSMsgType.TEXT:
-                    self.connection_id = json.loads(msg.data)["headers"]["Spotify-Connection-Id"]
-                    _LOGGER.info(f"WebSocket connection established. Connection ID: {self.connection_id}")
-                    device_id = await self.create_device()
+        async with self._websocket_session.ws_connect(uri, ssl=ssl_context) as ws:
+            self.ws = ws
+            msg = await ws.receive()
+            if msg.type == WSMsgType.TEXT:
+                self.connection_id = json_loads(msg.data)["headers"]["Spotify-Connection-Id"]
+                _LOGGER.info(f"WebSocket connection established. Connection ID: {self.connection_id}")
+                self._stats.increment("websocket_connections")
+                device_id = await self.create_device()
 
-                    if device_id:
-                        await self.update_device_state()
-                        self._ping_task = asyncio.create_task(self.ping_loop())
+                if device_id:
+                    await self.update_device_state()
+                    self._ping_task = asyncio.create_task(self.ping_loop())
+                    async_dispatcher_send(self.hass, self.update_signal, {"connection"})
 
+                    try:
                         async for msg in ws:
                             if msg.type == WSMsgType.TEXT:
-                                data = json.loads(msg.data)
-                                if data.get("type") == "pong":
-                                    continue
-                                await self.process(data)
+                                self._stats.record_message()
+                                with self._stats.timed("process_message"):
+                                    data = decode_message(msg.data)
+                                    if data is not None:
+                                        await self.process(data)
                             elif msg.type == WSMsgType.CLOSED:
                                 _LOGGER.warning("WebSocket closed")
                                 break
                             elif msg.type == WSMsgType.ERROR:
                                 _LOGGER.error("WebSocket error")
                                 break
+                    finally:
+                        self._ping_task.cancel()
 
     async def process(self, response):
-        """Process the websocket response."""
+        """Apply a cluster update and notify the entity of what changed."""
         try:
-            if 'cluster' in response['payloads'][0]:
-                devices = response['payloads'][0]['cluster']['devices']
-                device_dict = {}
-                for device_id, device_info in devices.items():
-                    alias_id = next(iter(device_info.get("device_aliases", {})), None)
-                    display_name = device_info["device_aliases"].get(alias_id, {}).get("display_name") if alias_id else device_info.get("name", device_id)
-                    device_dict[display_name] = device_id
-                self._devices = device_dict
-            self.response = response
-            self.hass.bus.async_fire("spotify_websocket_update")
+            payload = response['payloads'][0]
+            if 'cluster' not in payload:
+                return
+            if self.state is None:
+                self.state = ClusterState()
+            changed = self.state.apply(payload['cluster'])
+            if 'devices' in changed:
+                self.devices.update(self.state.devices)
+            if changed:
+                self._schedule_update(changed)
         except Exception as e:
             _LOGGER.error(f"Error processing response: {e}")
+
+    def _schedule_update(self, changed):
+        """Coalesce bursts of changes into one notification.
+
+        The notification is sent once no change has arrived for the coalescing
+        window, but never later than max_latency after the first pending change.
+        """
+        now = self.hass.loop.time()
+        self._pending_changes |= changed
+        if self._expect_echo:
+            # A command is waiting for confirmation, so don't hold its echo back
+            self._expect_echo = False
+            self._flush_update()
+            return
+        if self._pending_since is None:
+            self._pending_since = now
+        if self._flush_timer:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+
+        delay = min(self._coalesce_window, self._pending_since + self._max_latency - now)
+        if delay <= 0:
+            self._flush_update()
+        else:
+            self._flush_timer = self.hass.loop.call_later(delay, self._flush_update)
+
+    def expect_command_echo(self):
+        """Deliver the next change immediately instead of coalescing it."""
+        self._expect_echo = True
+
+    def _flush_update(self):
+        if self._flush_timer:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        changed = self._pending_changes
+        self._pending_changes = set()
+        self._pending_since = None
+        async_dispatcher_send(self.hass, self.update_signal, changed)